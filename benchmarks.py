@@ -0,0 +1,214 @@
+import math
+import time
+import numpy as np
+import gravity_functions as gravity
+import integrating_functions as integrating
+import fitting_functions as fitting
+import model_functions as models
+from data_functions import SectionedData
+
+
+"""
+This is the file for timing the slow parts of the software.
+
+Run this file to print the timings. Each benchmark checks how the time grows with the size of the problem.
+"""
+
+
+def best_time(function, repeats=5):
+    """
+    :return: The fastest time in seconds out of several runs of the function.
+    """
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark_flattening(points=1_000_000, section_counts=(10, 100, 1000, 10000, 100000)):
+    """
+    Times splitting a fixed number of rows into sections at the invalid rows, like when a plot is prepared,
+    and joining the sections into one line to draw, for more and more sections.
+    The time should grow with the number of points plus the number of sections,
+    not the number of points times the number of sections like repeatedly adding lists together.
+    """
+
+    print(f"Flattening {points} points")
+    rng = np.random.default_rng(0)
+    x = np.arange(points, dtype=np.float64)
+    y = rng.normal(size=points)
+    times = []
+    for count in section_counts:
+        valid = np.ones(points, dtype=bool)
+        valid[np.linspace(0, points, count + 1).astype(np.intp)[1:-1]] = False
+
+        from_mask = best_time(lambda: SectionedData.from_mask(x, y, valid))
+        joined = best_time(SectionedData.from_mask(x, y, valid).joined)
+        times.append(from_mask + joined)
+        print(f"  {count:>7} sections: from_mask {from_mask * 1000:8.2f} ms, joined {joined * 1000:8.2f} ms")
+
+    growth = times[-1] / times[0]
+    print(f"  time grew {growth:.1f}x for {section_counts[-1] // section_counts[0]}x more sections")
+    return growth
+
+
+def original_pull(object1, object2, accuracy):
+    """
+    The pull between two bodies as it was worked out before the simulation used numpy, to compare against.
+    """
+
+    force = ((gravity.G * object1[-1] * object2[-1]) / ((object2[0] - object1[0]) ** 2 + (object2[1] - object1[1]) ** 2)) * accuracy
+    try:
+        angle = math.atan((object2[0] - object1[0]) / (object2[1] - object1[1]))
+    except ZeroDivisionError:
+        if object1[0] - object2[0] > 0:
+            angle = math.pi
+        else:
+            angle = -math.pi
+
+    if angle >= 0 and object1[1] > object2[1]:
+        object1[2] -= (force * math.sin(angle)) / object1[-1]
+        object2[2] += (force * math.sin(angle)) / object2[-1]
+        object1[3] -= (force * math.cos(angle)) / object1[-1]
+        object2[3] += (force * math.cos(angle)) / object2[-1]
+    elif angle >= 0 and object1[1] < object2[1]:
+        object1[2] += (force * math.sin(angle)) / object1[-1]
+        object2[2] -= (force * math.sin(angle)) / object2[-1]
+        object1[3] += (force * math.cos(angle)) / object1[-1]
+        object2[3] -= (force * math.cos(angle)) / object2[-1]
+    elif object1[0] > object2[0]:
+        object1[2] += (force * math.sin(angle)) / object1[-1]
+        object2[2] -= (force * math.sin(angle)) / object2[-1]
+        object1[3] += (force * math.cos(angle)) / object1[-1]
+        object2[3] -= (force * math.cos(angle)) / object2[-1]
+    else:
+        object1[2] -= (force * math.sin(angle)) / object1[-1]
+        object2[2] += (force * math.sin(angle)) / object2[-1]
+        object1[3] -= (force * math.cos(angle)) / object1[-1]
+        object2[3] += (force * math.cos(angle)) / object2[-1]
+
+
+def python_gravity_step(bodies, dt):
+    """
+    A step of the simulation with the original python loop over every pair of bodies, to compare against.
+    :param bodies: A list of [x, y, x velocity, y velocity, mass] for each body.
+    """
+
+    for i in range(len(bodies) - 1):
+        for j in range(i + 1, len(bodies)):
+            original_pull(bodies[i], bodies[j], dt)
+    for body in bodies:
+        body[0] += body[2] * dt
+        body[1] += body[3] * dt
+
+
+def random_bodies(count):
+    rng = np.random.default_rng(0)
+    return np.column_stack((rng.normal(size=(count, 2)) * gravity.AU, rng.normal(size=(count, 2)) * 1e4,
+                            rng.uniform(1e23, 1e30, count)))
+
+
+def benchmark_gravity(body_counts=(5, 50, 500, 2000, 5000), python_limit=500, steps=20):
+    """
+    Times a step of the gravity simulation with numpy and with the original python loop over the pairs of bodies.
+    Both take time proportional to the number of pairs, numpy is faster once there are enough bodies
+    for the time spent on each pair to matter more than the time spent starting each numpy operation.
+    For a few bodies, eg. the 5 in gravity_2D_sim.py, the python loop is faster.
+    """
+
+    print("Gravity simulation steps")
+    speedups = {}
+    for count in body_counts:
+        bodies = random_bodies(count)
+        simulation = gravity.Simulation.from_bodies(bodies)
+        numpy_time = best_time(lambda: [simulation.step(1.0) for _ in range(steps)], repeats=3) / steps
+
+        line = f"  {count:>6} bodies: numpy {numpy_time * 1000:9.3f} ms"
+        if count <= python_limit:
+            python_bodies = bodies.tolist()
+            python_time = best_time(lambda: [python_gravity_step(python_bodies, 1.0) for _ in range(steps)],
+                                    repeats=3) / steps
+            speedups[count] = python_time / numpy_time
+            line += f", python loop {python_time * 1000:9.3f} ms, numpy {speedups[count]:.2f}x faster"
+        print(line)
+    return speedups
+
+
+def benchmark_integrators(years=1, accuracy_multipliers=(100, 20, 5)):
+    """
+    Runs the solar system with each integrator and prints the steps per second and how much the energy drifted.
+    Lower accuracy multipliers take longer steps, so fewer steps are needed for each frame that is drawn.
+    """
+
+    print(f"Integrators over {years} year(s) of the solar system")
+    drifts = {}
+    for name in integrating.integrator_dict:
+        for multiplier in accuracy_multipliers:
+            simulation, _ = gravity.solar_system(name)
+            max_step = simulation.time_step(gravity.AU, multiplier, 2000 * 100 / multiplier)
+            steps, steps_per_second, drift = integrating.measure(simulation, years * 365.25 * 86400, max_step)
+            drifts[name, multiplier] = drift
+            print(f"  {name:>16}, accuracy multiplier {multiplier:>3}: {steps:>7} steps, "
+                  f"{steps_per_second:8.0f} steps/s, energy drift {drift:.2e}")
+    return drifts
+
+
+def benchmark_barnes_hut(body_counts=(250, 500, 1000, 2000, 5000, 10000, 20000), theta=0.5, direct_limit=20000):
+    """
+    Times the Barnes-Hut approximation against adding the pull of every pair of bodies,
+    and finds the number of bodies where Barnes-Hut becomes faster.
+    :return: The smallest number of bodies where Barnes-Hut was faster, or None if it never was.
+    """
+
+    print(f"Barnes-Hut with theta = {theta} against direct summation")
+    crossover = None
+    for count in body_counts:
+        bodies = random_bodies(count)
+        positions, masses = bodies[:, :2], bodies[:, 4]
+        tree_time = best_time(lambda: gravity.barnes_hut_accelerations(positions, masses, theta=theta), repeats=3)
+
+        line = f"  {count:>6} bodies: Barnes-Hut {tree_time * 1000:9.2f} ms"
+        if count <= direct_limit:
+            direct_time = best_time(lambda: gravity.direct_accelerations(positions, masses), repeats=3)
+            exact = gravity.direct_accelerations(positions, masses)
+            approximate = gravity.barnes_hut_accelerations(positions, masses, theta=theta)
+            error = np.median(np.linalg.norm(approximate - exact, axis=1) / np.linalg.norm(exact, axis=1))
+            line += f", direct {direct_time * 1000:9.2f} ms, median error {error:.2%}"
+            if crossover is None and tree_time < direct_time:
+                crossover = count
+        print(line)
+
+    print(f"  Barnes-Hut is faster from {crossover} bodies" if crossover else "  Barnes-Hut was never faster")
+    return crossover
+
+
+def benchmark_fitting(point_counts=(10_000, 1_000_000, 10_000_000)):
+    """
+    Times fitting each model to noisy data from the model.
+    Polynomials use every point, other models use at most fitting.MAX_FIT_POINTS points.
+    """
+
+    print("Fitting models")
+    rng = np.random.default_rng(0)
+    true_params = {models.linear: [2, 3], models.quadratic: [0.5, -2, 3], models.extended_exponential: [2, 1.5, -4]}
+    for count in point_counts:
+        x = np.linspace(0, 10, count)
+        for model, params in true_params.items():
+            y = model(x, *params) + rng.normal(0, 0.5, count)
+            fit_time = best_time(lambda: fitting.fit_model(model, x, y, len(params)), repeats=3)
+            print(f"  {count:>8} points, {model.__name__:>20}: {fit_time * 1000:8.1f} ms")
+
+
+def main():
+    benchmark_flattening()
+    benchmark_gravity()
+    benchmark_integrators()
+    benchmark_barnes_hut()
+    benchmark_fitting()
+
+
+if __name__ == "__main__":
+    main()
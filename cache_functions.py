@@ -0,0 +1,100 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+"""
+This is the file for remembering results calculated from data, like lines of best fit and smoothed lines,
+so redrawing the graph doesn't calculate them again.
+
+Results are stored by a key made from a hash of the data and the options used to calculate them.
+When the cache holds more than MAX_RESULTS results or more than MAX_BYTES of arrays,
+the results that were used longest ago are removed, so a few results from large files can't fill the memory.
+"""
+
+
+MAX_RESULTS = 256
+MAX_BYTES = 512 * 1024 ** 2
+
+
+def result_size(result):
+    """
+    :return: The bytes of the arrays in a result, including those in tuples, lists and the attributes of objects.
+    """
+
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    if isinstance(result, (tuple, list)):
+        return sum(result_size(value) for value in result)
+    if hasattr(result, "__dict__"):
+        return sum(result_size(value) for value in vars(result).values())
+    return 0
+
+
+class ResultCache:
+    """
+    A least recently used cache of results shared between all the lines on the graph.
+    Results can be added from background threads while the graph is being drawn.
+    """
+
+    def __init__(self, max_size, max_bytes):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.results = OrderedDict()
+        self.sizes = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, calculate):
+        """
+        :param key: A hashable key of the data and options.
+        :param calculate: A function to calculate the result if it isn't stored.
+        :return: The result.
+        """
+
+        with self.lock:
+            if key in self.results:
+                self.hits += 1
+                self.results.move_to_end(key)
+                return self.results[key]
+            self.misses += 1
+
+        # calculated outside the lock so other results can be used in the meantime
+        result = calculate()
+        size = result_size(result)
+        with self.lock:
+            # another thread may have calculated the same result in the meantime
+            self.bytes -= self.sizes.get(key, 0)
+            self.results[key] = result
+            self.results.move_to_end(key)
+            self.sizes[key] = size
+            self.bytes += size
+            # the newest result is always kept, even if it is larger than the limit on its own
+            while len(self.results) > 1 and (len(self.results) > self.max_size or self.bytes > self.max_bytes):
+                old_key, _ = self.results.popitem(last=False)
+                self.bytes -= self.sizes.pop(old_key)
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+            self.sizes.clear()
+            self.bytes = 0
+
+
+results = ResultCache(MAX_RESULTS, MAX_BYTES)
+
+
+def cached(name, data, *options, calculate):
+    """
+    Gets a result calculated from data, only calculating it if it isn't in the cache.
+    :param name: The name of the result, eg. "fit".
+    :param data: The SectionedData the result is calculated from.
+    :param options: Any options that change the result.
+    :param calculate: A function that calculates the result.
+    :return: The result.
+    """
+
+    return results.get((name, data.key(), options), calculate)
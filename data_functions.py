@@ -0,0 +1,437 @@
+import hashlib
+import os
+import threading
+import numpy as np
+import reading_functions as reading
+import transforming_functions as transform_func
+import scaling_functions as scaling
+import sidecar_functions as sidecar
+from cache_functions import cached
+
+
+"""
+This is the file for loading data files into columns.
+
+A file is parsed into a Dataset which holds each column as a numpy array of floats
+with a mask showing which rows contain numbers.
+The file is read by the reader for its type of file (see reading_functions.py).
+Columns are only read when they are needed, and files are read in chunks
+so reading can report progress and be cancelled.
+Datasets are cached by filename and are reloaded when the file is changed on disk.
+Columns that have been read are also saved in the user's cache folder (see sidecar_functions.py)
+so they don't have to be read again the next time the program is opened.
+"""
+
+
+class Dataset:
+    """
+    The columns of a data file parsed into numpy arrays.
+    Only the headers are read at first, each column is read the first time it is used.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.mtime, self.size = self.file_state()
+
+        self.reader = reading.get_reader(filename)(filename)
+        self.headers = self.reader.headers()
+        self.columns = {}
+        # stops two plots being prepared at once from reading the same columns twice
+        self.lock = threading.Lock()
+
+    def file_state(self):
+        stat = os.stat(self.filename)
+        return stat.st_mtime_ns, stat.st_size
+
+    def is_stale(self):
+        """
+        Checks if the file has been changed since it was read.
+        """
+
+        try:
+            return self.file_state() != (self.mtime, self.size)
+        except OSError:
+            return True
+
+    def column_index(self, name):
+        if name not in self.headers:
+            raise KeyError(name)
+        # duplicate headers use the last column like csv.DictReader
+        return len(self.headers) - 1 - self.headers[::-1].index(name)
+
+    def load_columns(self, names, progress=None, cancelled=None):
+        """
+        Reads columns from the file, skipping columns that have already been read.
+        :param names: The headers of the columns to read.
+        :param progress: A function that is called with the fraction of the file read after each chunk.
+        :param cancelled: A function that returns True if reading should stop, LoadCancelled is then raised.
+        """
+
+        with self.lock:
+            indexes = {name: self.column_index(name) for name in names if name not in self.columns}
+
+            # columns saved from an earlier session don't need reading
+            if self.reader.sidecar:
+                for name, i in list(indexes.items()):
+                    saved = sidecar.load_column(self.filename, self.mtime, self.size, i)
+                    if saved is not None:
+                        self.columns[name] = saved
+                        del indexes[name]
+
+            if not indexes:
+                return
+
+            loaded = self.reader.load_columns(sorted(set(indexes.values())), progress, cancelled)
+            for name, i in indexes.items():
+                self.columns[name] = loaded[i]
+                if self.reader.sidecar:
+                    sidecar.save_column(self.filename, self.mtime, self.size, i, *loaded[i])
+
+    def is_loaded(self, *names):
+        return all(name in self.columns for name in names)
+
+    def column(self, name):
+        """
+        :param name: The header of the column.
+        :return: An array of the values in the column and a mask of which values are numeric.
+        """
+
+        self.load_columns([name])
+        return self.columns[name]
+
+
+datasets = {}
+# stops plots being prepared at once from each making a Dataset for the same file
+datasets_lock = threading.Lock()
+
+
+def load_dataset(filename):
+    """
+    Gets the dataset for a file, only reading the file if it hasn't been read or has changed.
+    :param filename: The path to the data file.
+    :return: The Dataset for the file.
+    """
+
+    with datasets_lock:
+        dataset = datasets.get(filename)
+        if dataset is None or dataset.is_stale():
+            dataset = Dataset(filename)
+            datasets[filename] = dataset
+        return dataset
+
+
+class SectionedData:
+    """
+    Points split into sections wherever the data has a gap.
+    All the points are stored in one pair of arrays with the index each new section starts at.
+    Points can also have weights, which are used by the lines of best fit.
+    Call changed() after editing the arrays.
+
+    Rows can be added to the end with extend, the arrays are then views of larger buffers
+    that double in size when they are full, so adding rows takes time in proportion to the rows added.
+    """
+
+    def __init__(self, x, y, breaks=(), weights=None):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.breaks = np.asarray(breaks, dtype=np.intp)
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float64)
+        self.hash = None
+
+        # if the rows the data was made from ended with invalid rows, so the next row added starts a section
+        self.gap_at_end = False
+        # the buffers the arrays are views of once rows have been added, and where the views start
+        self.buffers = None
+        self.offset = 0
+
+    @classmethod
+    def from_mask(cls, x, y, valid, weights=None):
+        """
+        Removes the invalid rows, starting a new section after each run of invalid rows.
+        :param x: Array of x values for every row.
+        :param y: Array of y values for every row.
+        :param valid: Mask of which rows are valid.
+        :param weights: Array of the weight of every row, or None if the points aren't weighted.
+        """
+
+        # rows that are valid but come after an invalid row
+        starts = np.flatnonzero(valid[1:] & ~valid[:-1]) + 1
+        breaks = np.cumsum(valid)[starts] - 1
+        data = cls(x[valid], y[valid], breaks[breaks > 0], None if weights is None else weights[valid])
+        data.gap_at_end = bool(len(valid)) and not valid[-1]
+        return data
+
+    def __len__(self):
+        return len(self.x)
+
+    def key(self):
+        """
+        :return: A hash of the points, used to cache results calculated from them.
+        """
+
+        if self.hash is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for array in (self.x, self.y, self.breaks):
+                digest.update(np.ascontiguousarray(array).data)
+            if self.weights is not None:
+                digest.update(np.ascontiguousarray(self.weights).data)
+            digest.update(str(len(self.x)).encode())
+            self.hash = digest.hexdigest()
+        return self.hash
+
+    def changed(self):
+        self.hash = None
+
+    def chain_key(self, *changes):
+        """
+        Makes the key of the data from its old key and a description of a change to it,
+        so the points don't all have to be hashed again after adding a few.
+        """
+
+        if self.hash is None:
+            return
+        digest = hashlib.blake2b(self.hash.encode(), digest_size=16)
+        for change in changes:
+            digest.update(change.encode())
+        self.hash = digest.hexdigest()
+
+    def extend(self, x, y, valid, weights=None):
+        """
+        Adds rows to the end of the data, removing the invalid rows like from_mask.
+        :param x: Array of x values for every new row.
+        :param y: Array of y values for every new row.
+        :param valid: Mask of which new rows are valid.
+        :param weights: Array of the weight of every new row, used if the data has weights.
+        :return: The SectionedData of the valid rows added.
+        """
+
+        added = SectionedData.from_mask(x, y, valid, weights if self.weights is not None else None)
+        if not len(valid):
+            return added
+
+        breaks = added.breaks + len(self.x)
+        # invalid rows between the old and new points start a new section
+        if len(added) and len(self.x) and (self.gap_at_end or not valid[0]):
+            breaks = np.insert(breaks, 0, len(self.x))
+        self.gap_at_end = added.gap_at_end if len(added) else True
+
+        names = ["x", "y"] if self.weights is None else ["x", "y", "weights"]
+        old_size = len(self.x)
+        size = old_size + len(added)
+        if self.buffers is None or self.offset + size > len(self.buffers["x"]):
+            # move the points to the start of new buffers twice the size needed
+            capacity = max(2 * size, 1024)
+            buffers = {name: np.empty(capacity) for name in names}
+            for name in names:
+                buffers[name][:old_size] = getattr(self, name)
+            self.buffers, self.offset = buffers, 0
+
+        for name in names:
+            buffer = self.buffers[name]
+            buffer[self.offset + old_size:self.offset + size] = getattr(added, name)
+            setattr(self, name, buffer[self.offset:self.offset + size])
+        self.breaks = np.concatenate((self.breaks, breaks))
+        self.chain_key("added", added.key())
+        return added
+
+    def keep_last(self, count):
+        """
+        Removes the oldest points so there are at most count points.
+        :return: The SectionedData of the points removed.
+        """
+
+        removed_count = len(self.x) - count
+        if removed_count <= 0:
+            return SectionedData([], [])
+
+        removed = SectionedData(self.x[:removed_count].copy(), self.y[:removed_count].copy(),
+                                weights=None if self.weights is None else self.weights[:removed_count].copy())
+        self.x, self.y = self.x[removed_count:], self.y[removed_count:]
+        if self.weights is not None:
+            self.weights = self.weights[removed_count:]
+        if self.buffers is not None:
+            # the buffers are reused until the points reach the end of them
+            self.offset += removed_count
+        breaks = self.breaks - removed_count
+        self.breaks = breaks[breaks > 0]
+        self.chain_key("removed", str(removed_count))
+        return removed
+
+    def remove_last(self):
+        """
+        Removes the newest point.
+        :return: The SectionedData of the point removed.
+        """
+
+        removed = SectionedData(self.x[-1:].copy(), self.y[-1:].copy(),
+                                weights=None if self.weights is None else self.weights[-1:].copy())
+        self.x, self.y = self.x[:-1], self.y[:-1]
+        if self.weights is not None:
+            self.weights = self.weights[:-1]
+        self.breaks = self.breaks[self.breaks < len(self.x)]
+        self.chain_key("removed last")
+        return removed
+
+    def joined(self):
+        """
+        Joins the sections into one pair of arrays with nan between each section,
+        so they can be drawn as a single line with breaks in it.
+        :return: The x and y arrays.
+        """
+
+        return np.insert(self.x, self.breaks, np.nan), np.insert(self.y, self.breaks, np.nan)
+
+
+def scale_data(data, scale):
+    """
+    Scales the y values of data.
+    The result is cached, so changing the scaling back and forth doesn't calculate it again.
+    :param data: The SectionedData to scale.
+    :param scale: The name of the scaling in scaling_dict.
+    :return: The scaled SectionedData.
+    """
+
+    if scale == scaling.NO_SCALING or not len(data):
+        return data
+
+    return cached("scaled", data, scale, calculate=lambda: SectionedData(
+        data.x, scaling.scaling_dict[scale](data.y), data.breaks, data.weights))
+
+
+def prepare_data(dataset, x_name, y_name, x_func, y_func, scale, weights_name=None, progress=None, cancelled=None):
+    """
+    Reads, transforms and scales the points for a plot.
+    This doesn't use anything from the window so it can be run in the background.
+    :param dataset: The Dataset to read the columns from.
+    :param x_name: The header of the x column.
+    :param y_name: The header of the y column.
+    :param x_func: The name of the function to apply to the x values.
+    :param y_func: The name of the function to apply to the y values.
+    :param scale: The name of the scaling to apply to the y values.
+    :param weights_name: The header of the column of weights for the line of best fit, or None.
+    :param progress: A function that is called with the fraction of the file read.
+    :param cancelled: A function that returns True if reading should stop.
+    :return: The SectionedData of the valid points.
+    """
+
+    names = [x_name, y_name] if weights_name is None else [x_name, y_name, weights_name]
+    dataset.load_columns(names, progress, cancelled)
+
+    weights = None if weights_name is None else dataset.column(weights_name)
+    x, y, valid, weights = transform_rows(dataset.column(x_name), dataset.column(y_name), x_func, y_func, weights)
+
+    # gaps in the data start new sections
+    data = SectionedData.from_mask(x, y, valid, weights)
+    return scale_data(data, scale)
+
+
+def transform_rows(x_column, y_column, x_func, y_func, weights_column=None):
+    """
+    Applies the functions to the values of rows.
+    :param x_column: The values and mask of the x column.
+    :param y_column: The values and mask of the y column.
+    :param weights_column: The values and mask of the weights column, or None.
+    :return: The x and y values, a mask of which rows are valid and the weights.
+    """
+
+    x_vals, x_valid = x_column
+    y_vals, y_valid = y_column
+    x_vals, x_transformed = transform_func.apply_function(x_func, x_vals)
+    y_vals, y_transformed = transform_func.apply_function(y_func, y_vals)
+    valid = x_valid & y_valid & x_transformed & y_transformed
+
+    weights = None
+    if weights_column is not None:
+        # rows without a weight, or with a negative weight, are left out
+        weights, weights_valid = weights_column
+        valid &= weights_valid & (weights >= 0)
+    return x_vals, y_vals, valid, weights
+
+
+class LiveData:
+    """
+    Keeps the points of a plot up to date with a csv file that is still being written.
+    Only the rows added to the file since it was last read are read and added to the points.
+    The rows are read with read, which can be run in the background, then added with apply.
+    """
+
+    def __init__(self, dataset, data, x_name, y_name, x_func, y_func, weights_name=None, window=None):
+        """
+        :param dataset: The Dataset the points were read from.
+        :param data: The SectionedData of the points, which rows are added to.
+        :param window: The most points to keep, the oldest points are removed. None keeps every point.
+        """
+
+        if type(dataset.reader) is not reading.CsvReader:
+            raise ValueError("Only uncompressed csv files can be followed.")
+
+        self.data = data
+        self.funcs = x_func, y_func
+        self.window = window
+        names = [x_name, y_name] if weights_name is None else [x_name, y_name, weights_name]
+        self.indexes = [dataset.column_index(name) for name in names]
+        # the reader only read the file up to its size when the reader was made
+        self.tail = reading.CsvTail(dataset.filename, sorted(set(self.indexes)), dataset.reader.size)
+
+        # a last row without a newline after it may still be being written, it is kept as it is,
+        # eg. if the file is finished, and replaced when the rest of its line is read
+        self.unfinished = None
+        if self.tail.offset < dataset.reader.size:
+            last_rows = [(values[-2:], mask[-2:]) for values, mask in map(dataset.column, names)]
+            _, _, valid, _ = transform_rows(last_rows[0], last_rows[1], x_func, y_func, *last_rows[2:])
+            # if the last row made a point and if the data ended with a gap before it
+            self.unfinished = bool(valid[-1]), len(valid) > 1 and not valid[-2]
+
+        if window is not None:
+            data.keep_last(window)
+
+    def read(self, progress=None, cancelled=None):
+        """
+        Reads and transforms the rows written since the last read, this can be run in a background thread.
+        :return: The x values, y values, mask of valid rows and weights of the new rows, or None if there are none.
+        """
+
+        columns = self.tail.read_rows()
+        if columns is None:
+            return None
+        weights = columns[self.indexes[2]] if len(self.indexes) > 2 else None
+        return transform_rows(columns[self.indexes[0]], columns[self.indexes[1]], *self.funcs, weights)
+
+    def apply(self, rows):
+        """
+        Adds the rows from read to the points.
+        :return: The SectionedData of the points added and of the points removed,
+            by the window or because they were replaced by the finished row.
+        """
+
+        if rows is None:
+            return SectionedData([], []), SectionedData([], [])
+
+        removed = []
+        if self.unfinished is not None:
+            had_point, gap_before = self.unfinished
+            # the first row read is the finished version of the last row
+            if had_point and len(self.data):
+                removed.append(self.data.remove_last())
+            self.data.gap_at_end = gap_before
+            self.unfinished = None
+
+        added = self.data.extend(*rows)
+
+        if self.window is not None:
+            removed.append(self.data.keep_last(self.window))
+        return added, join_points(removed)
+
+
+def join_points(parts):
+    """
+    :param parts: A list of SectionedData, all with or all without weights.
+    :return: The points of every part in one SectionedData, without sections.
+    """
+
+    parts = [part for part in parts if len(part)]
+    if not parts:
+        return SectionedData([], [])
+    weights = None if parts[0].weights is None else np.concatenate([part.weights for part in parts])
+    return SectionedData(np.concatenate([part.x for part in parts]), np.concatenate([part.y for part in parts]),
+                         weights=weights)
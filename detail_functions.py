@@ -0,0 +1,285 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from data_functions import SectionedData
+
+
+"""
+This is the file for reducing the number of points drawn for large plots.
+
+Lines keep the first, last, lowest and highest point in each pixel column of the graph (min/max decimation),
+which draws the same as the full line.
+Scatters keep a random sample of points plus one point in every pixel the data covers,
+so the spread and outliers of the data are shown along with its density.
+
+The points are chosen again whenever the graph is zoomed so more detail appears as you zoom in.
+"""
+
+
+LINE_THRESHOLD = 10_000
+SCATTER_THRESHOLD = 20_000
+SCATTER_SAMPLE = 20_000
+
+
+def first_in_group(mask, group):
+    """
+    :param mask: Mask of the points to search.
+    :param group: Non-decreasing group number of each point.
+    :return: The index of the first point in each group where mask is true.
+    """
+
+    indices = np.flatnonzero(mask)
+    groups = group[indices]
+    return indices[np.diff(groups, prepend=-1) != 0]
+
+
+def min_max_indices(keys, y):
+    """
+    Finds the first, last, lowest and highest point for each run of equal keys.
+    :param keys: Non-decreasing array of the pixel each point is in.
+    :param y: Array of y values.
+    :return: Sorted indices of the points to keep.
+    """
+
+    if not len(keys):
+        return np.empty(0, dtype=np.intp)
+
+    starts = np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+    counts = np.diff(np.append(starts, len(keys)))
+    group = np.repeat(np.arange(len(starts)), counts)
+
+    lowest = first_in_group(y == np.repeat(np.minimum.reduceat(y, starts), counts), group)
+    highest = first_in_group(y == np.repeat(np.maximum.reduceat(y, starts), counts), group)
+    return np.unique(np.concatenate((starts, starts + counts - 1, lowest, highest)))
+
+
+def section_numbers(data):
+    """
+    :return: The number of the section each point is in.
+    """
+
+    section = np.zeros(len(data), dtype=np.intp)
+    section[data.breaks] = 1
+    return np.cumsum(section)
+
+
+def is_sorted(data):
+    """
+    :return: If the x values increase through every section.
+    """
+
+    increasing = np.diff(data.x) >= 0
+    # going back at the start of a new section is allowed
+    increasing[data.breaks - 1] = True
+    return bool(increasing.all())
+
+
+def view_limits(ax, x, y):
+    """
+    :return: The x and y limits of the region to draw, the whole data if the graph isn't zoomed.
+    """
+
+    if ax.get_autoscalex_on():
+        x_limits = (x.min(), x.max())
+    else:
+        x_limits = sorted(ax.get_xlim())
+
+    if ax.get_autoscaley_on():
+        y_limits = (y.min(), y.max())
+    else:
+        y_limits = sorted(ax.get_ylim())
+    return x_limits, y_limits
+
+
+def pixel_positions(values, limits, pixels):
+    """
+    :return: The pixel each value is in when the limits are drawn across the given number of pixels.
+    """
+
+    low, high = limits
+    if high <= low:
+        return np.zeros(len(values), dtype=np.intp)
+    return np.floor((values - low) * (pixels / (high - low))).astype(np.intp)
+
+
+def pixel_grid(x, y, ax, polar):
+    """
+    Splits the graph into a grid about the size of a pixel.
+    Polar graphs are split into a grid of angles and distances, with angles in radians.
+    :return: The column and row of the grid each point is in and the number of columns and rows.
+    """
+
+    width, height = max(int(ax.bbox.width), 1), max(int(ax.bbox.height), 1)
+    x_limits, y_limits = view_limits(ax, x, y)
+
+    if polar:
+        # the outside of the graph is about 4 times as long as the width
+        x, x_limits = np.mod(x, 2 * np.pi), (0, 2 * np.pi)
+        width, height = 4 * width, max(height // 2, 1)
+
+    return pixel_positions(x, x_limits, width), pixel_positions(y, y_limits, height), width, height
+
+
+def line_indices(data, sections, sorted_x, ax):
+    """
+    Chooses the points of a line to draw.
+    :param data: The SectionedData of the line.
+    :param sections: The section number of each point.
+    :param sorted_x: If the x values increase through each section.
+    :param ax: The axes the line is drawn on.
+    :return: Sorted indices of the points to draw.
+    """
+
+    if sorted_x and ax.name != "polar":
+        width = max(int(ax.bbox.width), 1)
+        x_limits, _ = view_limits(ax, data.x, data.y)
+
+        # points in view and the points either side of them so lines reach the edge of the graph
+        in_view = (data.x >= x_limits[0]) & (data.x <= x_limits[1])
+        near_view = in_view.copy()
+        near_view[:-1] |= in_view[1:]
+        near_view[1:] |= in_view[:-1]
+        indices = np.flatnonzero(near_view)
+
+        columns = np.clip(pixel_positions(data.x[indices], x_limits, width), -1, width) + 1
+        keys = sections[indices] * (width + 2) + columns
+        return indices[min_max_indices(keys, data.y[indices])]
+
+    # lines that go back on themselves only drop points that are in the same pixel as the point before them
+    polar = ax.name == "polar"
+    columns, rows, _, _ = pixel_grid(np.radians(data.x) if polar else data.x, data.y, ax, polar)
+
+    moved = np.ones(len(data), dtype=bool)
+    moved[1:] = (columns[1:] != columns[:-1]) | (rows[1:] != rows[:-1]) | (sections[1:] != sections[:-1])
+    # keep the last point before each move so the path is unchanged
+    keep = moved.copy()
+    keep[:-1] |= moved[1:]
+    keep[-1] = True
+    return np.flatnonzero(keep)
+
+
+def scatter_indices(x, y, priority, ax):
+    """
+    Chooses the points of a scatter to draw.
+    :param x: Array of x values, in radians for polar graphs.
+    :param y: Array of y values.
+    :param priority: Random number for each point, the points with the lowest numbers are sampled first.
+    :param ax: The axes the scatter is drawn on.
+    :return: Sorted indices of the points to draw.
+    """
+
+    columns, rows, width, height = pixel_grid(x, y, ax, ax.name == "polar")
+
+    in_view = np.flatnonzero((columns >= 0) & (columns <= width) & (rows >= 0) & (rows <= height))
+
+    # one point in every pixel with data
+    cells = np.full((width + 1) * (height + 1), -1, dtype=np.intp)
+    cells[columns[in_view] * (height + 1) + rows[in_view]] = in_view
+    cells = cells[cells >= 0]
+
+    # a random sample to show how dense the data is
+    if len(in_view) > SCATTER_SAMPLE:
+        sample = in_view[priority[in_view] < SCATTER_SAMPLE / len(in_view)]
+    else:
+        sample = in_view
+
+    # the extreme points so the graph is scaled to fit the data
+    extremes = [x.argmin(), x.argmax(), y.argmin(), y.argmax()]
+    return np.unique(np.concatenate((cells, sample, extremes)))
+
+
+class LineDetail:
+    """
+    Updates a line to draw only the points needed at the current zoom.
+    """
+
+    def __init__(self, ax, data, polar):
+        self.ax = ax
+        self.data = data
+        self.polar = polar
+        self.sections = section_numbers(data)
+        self.sorted_x = is_sorted(data)
+
+        self.artist = None
+        self.callbacks = []
+
+    def points(self):
+        """
+        :return: The x and y values to draw.
+        """
+
+        indices = line_indices(self.data, self.sections, self.sorted_x, self.ax)
+        breaks = np.flatnonzero(np.diff(self.sections[indices])) + 1
+        x, y = SectionedData(self.data.x[indices], self.data.y[indices], breaks).joined()
+        if self.polar:
+            x = np.radians(x)
+        return x, y
+
+    def attach(self, artist):
+        """
+        Starts updating the line when the graph is zoomed.
+        """
+
+        self.artist = artist
+        self.callbacks = [self.ax.callbacks.connect("xlim_changed", self.update),
+                          self.ax.callbacks.connect("ylim_changed", self.update)]
+
+    def update(self, _=None):
+        self.artist.set_data(*self.points())
+
+    def remove(self):
+        for callback in self.callbacks:
+            self.ax.callbacks.disconnect(callback)
+        self.callbacks = []
+
+
+class ScatterDetail(LineDetail):
+    """
+    Updates a scatter to draw only the points needed at the current zoom.
+    """
+
+    def __init__(self, ax, x, y):
+        super().__init__(ax, SectionedData(x, y), False)
+        self.priority = np.random.default_rng(0).random(len(x), dtype=np.float32)
+
+    def points(self):
+        indices = scatter_indices(self.data.x, self.data.y, self.priority, self.ax)
+        return self.data.x[indices], self.data.y[indices]
+
+
+def plot_line(data, polar, **kwargs):
+    """
+    Plots a line, reducing the number of points drawn if there are lots of points.
+    :param data: The SectionedData to plot.
+    :param polar: If the x values are angles in degrees.
+    :return: The line.
+    """
+
+    if len(data) <= LINE_THRESHOLD:
+        x, y = data.joined()
+        if polar:
+            x = np.radians(x)
+        line, = plt.plot(x, y, **kwargs)
+        return line
+
+    level_of_detail = LineDetail(plt.gca(), data, polar)
+    line, = plt.plot(*level_of_detail.points(), **kwargs)
+    level_of_detail.attach(line)
+    line.level_of_detail = level_of_detail
+    return line
+
+
+def plot_scatter(x, y, fmt, **kwargs):
+    """
+    Plots a scatter, reducing the number of points drawn if there are lots of points.
+    :return: The scatter.
+    """
+
+    if len(x) <= SCATTER_THRESHOLD:
+        line, = plt.plot(x, y, fmt, **kwargs)
+        return line
+
+    level_of_detail = ScatterDetail(plt.gca(), x, y)
+    line, = plt.plot(*level_of_detail.points(), fmt, **kwargs)
+    level_of_detail.attach(line)
+    line.level_of_detail = level_of_detail
+    return line
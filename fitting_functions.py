@@ -0,0 +1,368 @@
+import copy
+import math
+import numpy as np
+import scipy.optimize
+import scipy.special
+import model_functions as model_func
+
+
+"""
+This is the file for fitting lines to data.
+
+Lines of best fit are polynomials calculated from sums of powers of the data (Σx^i, Σx^iy, Σy²),
+so the fit, its uncertainty and Pearson's r all come from one pass over the data,
+and adding more points only adds the new points to the sums.
+
+Models from model_functions.py are fitted with fit_model.
+Models that are polynomials are fitted exactly from sums of the data, which are added up a chunk at a time.
+Other models are fitted by nonlinear least squares, which starts from a guess and improves it,
+using at most MAX_FIT_POINTS evenly spread points so large files can still be fitted quickly.
+
+To give a model a faster or more reliable fit add a function to fitting_dict in the form:
+   model_function: fitting_function
+The fitting function must accept the arguments x, y and return a ModelFit.
+"""
+
+
+# the most points used by fits that aren't calculated from sums
+MAX_FIT_POINTS = 100_000
+CHUNK_SIZE = 1_000_000
+
+
+class PolynomialFit:
+    """
+    A weighted least squares polynomial fit calculated from sums of the data.
+    More points can be added at any time and only the new points are added to the sums.
+
+    The sums are taken of t = (x - x_shift) / x_scale, and y - y_shift, to keep them accurate for large values.
+    The shift and scale are chosen from the first points added.
+    The weights multiply the squared distance of each point from the curve,
+    so points with a standard deviation of σ should have a weight of 1/σ².
+    Only the relative size of the weights matters.
+    """
+
+    def __init__(self, degree=1):
+        self.degree = degree
+        self.n = 0
+        self.x_shift = 0.0
+        self.x_scale = 1.0
+        self.y_shift = 0.0
+        self.shifted = False
+        # Σwt^(i + j), Σwt^i(y - y_shift), Σw(y - y_shift)²
+        self.moments = np.zeros((degree + 1, degree + 1))
+        self.totals = np.zeros(degree + 1)
+        self.sum_yy = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+        self.solution = None
+
+    @classmethod
+    def from_data(cls, x, y, degree=1, weights=None):
+        fit = cls(degree)
+        if len(x):
+            # all the points are known so the shift and scale can be chosen from all of them
+            fit.set_shift(np.mean(x), np.abs(x - np.mean(x)).max(), np.mean(y))
+        fit.add(x, y, weights)
+        return fit
+
+    def set_shift(self, x_shift, x_scale, y_shift):
+        self.x_shift = float(x_shift)
+        self.x_scale = float(x_scale) if x_scale > 0 else 1.0
+        self.y_shift = float(y_shift)
+        self.shifted = True
+
+    def add(self, x, y, weights=None):
+        """
+        Adds points to the fit.
+        :param x: Array of x values.
+        :param y: Array of y values.
+        :param weights: Array of the weight of each point, or None to weight every point the same.
+        """
+
+        if not len(x):
+            return
+        if not self.shifted:
+            self.set_shift(x[0], np.abs(x - x[0]).max(), y[0])
+        self.update_sums(x, y, weights, 1)
+        self.min = min(self.min, float(x.min()))
+        self.max = max(self.max, float(x.max()))
+
+    def remove(self, x, y, weights=None):
+        """
+        Removes points that were added to the fit, eg. the oldest points of data that only keeps the newest.
+        The range of x values isn't changed, set min and max if it is needed.
+        """
+
+        if len(x):
+            self.update_sums(x, y, weights, -1)
+
+    def needs_recentring(self):
+        """
+        Adding and removing points loses accuracy once the points have moved far from the shift and scale
+        the sums were taken with, eg. a window of the newest points that keeps moving along.
+        :return: If the fit should be calculated again from the points it holds.
+        """
+
+        total = self.moments[0, 0]
+        if self.n < 2 or total <= 0:
+            return False
+        mean_t = self.moments[0, 1] / total
+        span_t = (self.max - self.min) / self.x_scale
+        mean_dy = self.totals[0] / total
+        variance_dy = self.sum_yy / total - mean_dy ** 2
+        return abs(mean_t) > 1 or not 0.25 < span_t < 4 or mean_dy ** 2 > 100 * max(variance_dy, 0)
+
+    def update_sums(self, x, y, weights, sign):
+        """
+        Adds (sign = 1) or subtracts (sign = -1) points from the sums a chunk at a time.
+        """
+
+        size = self.degree + 1
+        for start in range(0, len(x), CHUNK_SIZE):
+            powers = np.vander((x[start:start + CHUNK_SIZE] - self.x_shift) / self.x_scale, size, increasing=True)
+            dy = y[start:start + CHUNK_SIZE] - self.y_shift
+            if weights is None:
+                self.moments += sign * (powers.T @ powers)
+                self.totals += sign * (powers.T @ dy)
+                self.sum_yy += sign * float(dy @ dy)
+            else:
+                weight = sign * weights[start:start + CHUNK_SIZE]
+                weighted = powers * weight[:, np.newaxis]
+                self.moments += weighted.T @ powers
+                self.totals += weighted.T @ dy
+                self.sum_yy += float(dy @ (weight * dy))
+
+        self.n += sign * len(x)
+        self.solution = None
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+    def solve(self):
+        """
+        :return: The coefficients of t with the lowest power first, their covariance
+            and the weighted sum of the squared distances of the points from the curve.
+            The covariance is nan when there are only just enough points for the fit.
+        """
+
+        if self.solution is None:
+            size = self.degree + 1
+            if self.n < size:
+                raise ValueError(f"At least {size} points are needed for this fit.")
+            try:
+                coefficients = np.linalg.solve(self.moments, self.totals)
+                covariance = np.linalg.inv(self.moments)
+            except np.linalg.LinAlgError:
+                raise ValueError("The x values don't vary enough for this fit.")
+
+            residual_sum = max(
+                self.sum_yy - 2 * coefficients @ self.totals + coefficients @ self.moments @ coefficients, 0.0)
+            if self.n > size:
+                covariance *= residual_sum / (self.n - size)
+            else:
+                # the curve goes through every point, so there is nothing left to estimate the uncertainty from
+                covariance[:] = np.nan
+            self.solution = coefficients, covariance, residual_sum
+        return self.solution
+
+    def coefficients(self):
+        """
+        :return: The coefficients of x with the lowest power first, and their covariance.
+        """
+
+        coefficients, covariance, _ = self.solve()
+        size = self.degree + 1
+
+        # coefficients of t to coefficients of x
+        variable = np.polynomial.Polynomial([-self.x_shift / self.x_scale, 1 / self.x_scale])
+        change = np.zeros((size, size))
+        for power in range(size):
+            change[:power + 1, power] = (variable ** power).coef
+        coefficients = change @ coefficients
+        coefficients[0] += self.y_shift
+        return coefficients, change @ covariance @ change.T
+
+    def evaluate(self, x):
+        """
+        :return: The y value of the fit at each x value and its standard error.
+        """
+
+        coefficients, covariance, _ = self.solve()
+        powers = np.vander((np.asarray(x) - self.x_shift) / self.x_scale, self.degree + 1, increasing=True)
+        uncertainty = np.sqrt(np.maximum(np.einsum("ij,jk,ik->i", powers, covariance, powers), 0))
+        return powers @ coefficients + self.y_shift, uncertainty
+
+    def gradient_intercept(self):
+        """
+        :return: The gradient and y-intercept of a straight line fit.
+        """
+
+        (c, m), _ = self.coefficients()
+        return m, c
+
+    def r_squared(self):
+        """
+        :return: The fraction of the variation in y explained by the fit.
+        """
+
+        _, _, residual_sum = self.solve()
+        total_sum = self.sum_yy - self.totals[0] ** 2 / self.moments[0, 0]
+        return 1 - residual_sum / total_sum if total_sum > 0 else math.nan
+
+    def pearson(self):
+        """
+        :return: Pearson's r of x and y and its two-sided p value.
+        """
+
+        if self.n < 2:
+            return math.nan, math.nan
+        total = self.moments[0, 0]
+        s_xx = self.moments[1, 1] - self.moments[0, 1] ** 2 / total
+        s_xy = self.totals[1] - self.moments[0, 1] * self.totals[0] / total
+        s_yy = self.sum_yy - self.totals[0] ** 2 / total
+        if s_xx <= 0 or s_yy <= 0:
+            return math.nan, math.nan
+        r = max(-1.0, min(1.0, s_xy / math.sqrt(s_xx * s_yy)))
+
+        degrees_of_freedom = self.n - 2
+        if degrees_of_freedom < 1:
+            return r, 1.0
+        if abs(r) == 1:
+            return r, 0.0
+        t = r * math.sqrt(degrees_of_freedom / (1 - r ** 2))
+        return r, float(2 * scipy.special.stdtr(degrees_of_freedom, -abs(t)))
+
+
+class ModelFit:
+    """
+    The inputs of a model that best fit some data.
+    """
+
+    def __init__(self, params, uncertainties, r_squared, points):
+        """
+        :param params: The value of each input of the model.
+        :param uncertainties: The standard error of each input.
+        :param r_squared: The fraction of the variation in y explained by the model.
+        :param points: The number of points used for the fit.
+        """
+
+        self.params = [float(param) for param in params]
+        self.uncertainties = [float(uncertainty) for uncertainty in uncertainties]
+        self.r_squared = float(r_squared)
+        self.points = points
+
+
+def fit_label(label_func, fit):
+    """
+    :param label_func: The label function of the model from models_dict.
+    :return: The label of the fitted model with its inputs to 4 significant figures and R².
+    """
+
+    return f"{label_func(*(float(f'{param:.4g}') for param in fit.params))}, R² = {fit.r_squared:.4f}"
+
+
+def decimate(x, y, max_points=MAX_FIT_POINTS):
+    """
+    :return: At most max_points evenly spread points from the data.
+    """
+
+    step = max(math.ceil(len(x) / max_points), 1)
+    return x[::step], y[::step]
+
+
+def r_squared(residual_sum, y):
+    total_sum = float(np.sum((y - y.mean()) ** 2))
+    return 1 - residual_sum / total_sum if total_sum > 0 else math.nan
+
+
+def polynomial_model_fit(x, y, degree):
+    """
+    :return: The ModelFit of a polynomial, with the highest power first like the models.
+    """
+
+    fit = PolynomialFit.from_data(x, y, degree)
+    coefficients, covariance = fit.coefficients()
+    return ModelFit(coefficients[::-1], np.sqrt(np.diag(covariance))[::-1], fit.r_squared(), len(x))
+
+
+def fit_linear(x, y):
+    return polynomial_model_fit(x, y, 1)
+
+
+def fit_quadratic(x, y):
+    return polynomial_model_fit(x, y, 2)
+
+
+def fit_curve(model, x, y, guess, bounds=(-np.inf, np.inf)):
+    """
+    Nonlinear least squares fit of any model, using at most MAX_FIT_POINTS points.
+    :param guess: The inputs to start improving from.
+    :param bounds: The lowest and highest values allowed for each input.
+    """
+
+    x, y = decimate(x, y)
+    if len(x) <= len(guess):
+        raise ValueError(f"At least {len(guess) + 1} points are needed to fit this model.")
+    try:
+        with np.errstate(all="ignore"):
+            params, covariance = scipy.optimize.curve_fit(model, x, y, p0=guess, bounds=bounds)
+    except RuntimeError:
+        raise ValueError("The fit didn't converge, the model might not suit the data.")
+
+    with np.errstate(all="ignore"):
+        residual_sum = float(np.sum((y - model(x, *params)) ** 2))
+    return ModelFit(params, np.sqrt(np.diag(covariance)), r_squared(residual_sum, y), len(x))
+
+
+def fit_exponential(x, y):
+    """
+    Fits y = ar^x + c. The starting guess comes from a straight line fit of log|y - c|,
+    trying c just below and just above the data, then all 3 inputs are improved together.
+    """
+
+    sample_x, sample_y = decimate(x, y)
+    if len(sample_x) <= 3:
+        raise ValueError("At least 4 points are needed to fit this model.")
+    span = max(float(np.ptp(sample_y)), 1e-12)
+
+    best = None
+    for sign, c in ((1, sample_y.min() - 0.01 * span), (-1, sample_y.max() + 0.01 * span)):
+        log_y = np.log(np.abs(sample_y - c))
+        log_r, log_a = np.polyfit(sample_x, log_y, 1)
+        guess = [sign * math.exp(log_a), math.exp(log_r), c]
+        with np.errstate(all="ignore"):
+            residual_sum = float(np.sum((sample_y - model_func.extended_exponential(sample_x, *guess)) ** 2))
+        if best is None or residual_sum < best[0]:
+            best = residual_sum, guess
+
+    return fit_curve(model_func.extended_exponential, x, y, best[1], ([-np.inf, 0, -np.inf], np.inf))
+
+
+fitting_dict = {
+    model_func.linear: fit_linear,
+    model_func.quadratic: fit_quadratic,
+    model_func.extended_exponential: fit_exponential
+}
+
+
+def fit_model(model, x, y, input_count):
+    """
+    Fits a model from models_dict to data, ignoring points that aren't finite.
+    :param model: The model function.
+    :param input_count: The number of inputs the model has.
+    :return: The ModelFit.
+    """
+
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+
+    if model in fitting_dict:
+        fit = fitting_dict[model](x, y)
+    else:
+        fit = fit_curve(model, x, y, np.ones(input_count))
+    if not all(map(math.isfinite, fit.params)):
+        raise ValueError("The model doesn't suit the data.")
+    return fit
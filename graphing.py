@@ -1,15 +1,27 @@
-import statistics
-import csv
+import math
+from PyQt6 import QtCore as qtc
 from PyQt6 import QtWidgets as qtw
 from functools import partial
+import data_functions as data_func
+import reading_functions as reading
 import transforming_functions as transform_func
+import scaling_functions as scaling
 import model_functions as model_func
+import fitting_functions as fit_func
 import plotting_functions as plot_func
+import graphing_lines as graph_lines
+import graphing_workers as graph_workers
 import graphing_colours as colours
 from graphing_functions import convert_to_number
 from graphing_interface import NormalGraph, PolarGraph
 
 
+# the highest degree of polynomial line of best fit that can be chosen
+MAX_FIT_DEGREE = 6
+# how often plots that follow a file check for new rows, in milliseconds
+LIVE_REFRESH_INTERVAL = 500
+
+
 class GraphOptionsWindow(qtw.QMainWindow):
 
     def __init__(self):
@@ -58,7 +70,23 @@ class GraphWindow(qtw.QMainWindow):
 
         self.in_window = False
 
-        self.handles = []
+        # plots are prepared in the background, requests holds the settings and progress bar of each one
+        self.scheduler = graph_workers.PlotScheduler()
+        self.scheduler.ready.connect(self.plot_ready)
+        self.scheduler.failed.connect(self.load_failed)
+        self.scheduler.progress.connect(self.show_progress)
+        self.scheduler.finished.connect(self.request_finished)
+        self.requests = {}
+
+        # plots that follow a file being written are updated at most once each interval,
+        # the new rows are read in the background and only added to the plots in the window's thread
+        self.live_scheduler = graph_workers.PlotScheduler(workers=1)
+        self.live_scheduler.ready.connect(self.live_rows_ready)
+        self.live_scheduler.failed.connect(self.live_failed)
+        self.live_timer = qtc.QTimer(self)
+        self.live_timer.setInterval(LIVE_REFRESH_INTERVAL)
+        self.live_timer.timeout.connect(self.refresh_live)
+
         self.lines = []
 
         # Set up graph
@@ -71,7 +99,7 @@ class GraphWindow(qtw.QMainWindow):
         self.colours = colours.colours
 
         # Window Settings
-        self.setFixedSize(230, 460)
+        self.setFixedSize(230, 610)
         self.setWindowTitle("Graph Generator")
 
         # Window Widgets
@@ -116,14 +144,35 @@ class GraphWindow(qtw.QMainWindow):
         self.drop_line_type.addItems(plot_func.plotting_dict.keys())
         self.form_layout.addRow("Plot type: ", self.drop_line_type)
 
+        self.bin_width = qtw.QLineEdit()
+        self.bin_width.setPlaceholderText("Automatic")
+        self.form_layout.addRow("Smoothing width", self.bin_width)
+
+        self.drop_scale = qtw.QComboBox()
+        self.drop_scale.addItems(scaling.scaling_dict.keys())
+        self.form_layout.addRow("Scale y-axis", self.drop_scale)
+
+        self.fit_degree = qtw.QSpinBox()
+        self.fit_degree.setRange(1, MAX_FIT_DEGREE)
+        self.form_layout.addRow("Best fit degree", self.fit_degree)
+
+        # the first option is no weights, the rest are the columns of the file
+        self.drop_weights = qtw.QComboBox()
+        self.drop_weights.addItem("None")
+        self.form_layout.addRow("Best fit weights", self.drop_weights)
+
+        self.live_window = qtw.QLineEdit()
+        self.live_window.setPlaceholderText("All")
+        self.form_layout.addRow("Points kept live", self.live_window)
+
         self.line_button = qtw.QCheckBox("Line of Best Fit")
         self.layout.addWidget(self.line_button)
 
         self.rank_button = qtw.QCheckBox("Include Pearson's r")
         self.layout.addWidget(self.rank_button)
 
-        self.scale_button = qtw.QCheckBox("Scale y-axis")
-        self.layout.addWidget(self.scale_button)
+        self.live_button = qtw.QCheckBox("Follow File as it's Written")
+        self.layout.addWidget(self.live_button)
 
         self.options_layout = qtw.QGridLayout()
         self.layout.addLayout(self.options_layout)
@@ -159,6 +208,10 @@ class GraphWindow(qtw.QMainWindow):
         self.model_button.clicked.connect(self.add_model)
         self.model_layout.addWidget(self.model_button)
 
+        self.fit_button = qtw.QPushButton("Fit Model")
+        self.fit_button.clicked.connect(self.fit_model)
+        self.model_layout.addWidget(self.fit_button)
+
         self.range_button = qtw.QPushButton("Edit Range")
         self.range_button.clicked.connect(self.edit_range)
         self.layout.addWidget(self.range_button)
@@ -171,31 +224,37 @@ class GraphWindow(qtw.QMainWindow):
 
     def ingest(self):
         """
-        Imports data from a csv file.
+        Imports data from a file, any type of file with a reader in reading_functions can be opened.
         """
 
         # Prevent multiple popups appearing
         if self.in_window:
             return
 
-        self.filename, _ = qtw.QFileDialog.getOpenFileName(self, "Open File", ".", "Csv Files (*.csv)")
+        self.filename, _ = qtw.QFileDialog.getOpenFileName(self, "Open File", ".", reading.file_filter())
         try:
-            with open(self.filename, "r") as file:
-                data_dict = csv.DictReader(file)
+            dataset = data_func.load_dataset(self.filename)
+        except (FileNotFoundError, TypeError):
+            return
+        except reading.READ_ERRORS as error:
+            self.load_failed(None, str(error))
+            return
 
-                # Remove old headings
-                self.drop_x_vals.clear()
-                self.drop_y_vals.clear()
+        # Remove old headings
+        self.drop_x_vals.clear()
+        self.drop_y_vals.clear()
+        while self.drop_weights.count() > 1:
+            self.drop_weights.removeItem(1)
 
-                # Add new headings
-                self.drop_x_vals.addItems(data_dict.fieldnames)
-                self.drop_y_vals.addItems(data_dict.fieldnames)
-        except (FileNotFoundError, TypeError):
-            pass
+        # Add new headings
+        self.drop_x_vals.addItems(dataset.headers)
+        self.drop_y_vals.addItems(dataset.headers)
+        self.drop_weights.addItems(dataset.headers)
 
     def add_plot(self):
         """
         Adds a plot to the graph.
+        The plot is prepared in the background and drawn when it is ready.
         """
 
         try:
@@ -204,95 +263,204 @@ class GraphWindow(qtw.QMainWindow):
                     self, "No File", "You haven't selected a file or the file you selected has beem moved or deleted.",
                     qtw.QMessageBox.StandardButton.Ok)
             else:
-                with open(self.filename, "r") as file:
-                    data_dict = csv.DictReader(file)
-
-                    data_found = False
-
-                    x = [[]]
-                    x_list = []
-                    y = [[]]
-                    y_list = []
-                    x_name = self.drop_x_vals.currentText()
-                    y_name = self.drop_y_vals.currentText()
-
-                    for row in data_dict:
-                        try:
-                            x_val = transform_func.function_dict[
-                                             self.drop_x_func.currentText()](float(row[x_name]))
-                            x[-1].append(x_val)
-                            x_list.append(x_val)
-
-                            try:
-                                y_val = transform_func.function_dict[
-                                    self.drop_y_func.currentText()](float(row[y_name]))
-                                y[-1].append(y_val)
-                                y_list.append(y_val)
-                                data_found = True
-
-                            except (ValueError, ZeroDivisionError):  # If data is not numeric
-                                # remove added x values
-                                x[-1].pop()
-                                x_list.pop()
-
-                                # create new section
-                                if x[-1]:
-                                    x.append([])
-                                    y.append([])
-                        except (ValueError, ZeroDivisionError):  # If data is not numeric
-                            # create new section
-                            if x[-1]:
-                                x.append([])
-                                y.append([])
-
-                if data_found:
-
-                    if self.scale_button.isChecked():
-                        # code y data so mean is 0 and 1 is one standard deviation
-                        y_bar = statistics.mean(y_list)
-                        y_std_dev = statistics.stdev(y_list)
-                        for section in y:
-                            for i in range(len(section)):
-                                if y_std_dev != 0:
-                                    section[i] = (section[i] - y_bar) / y_std_dev
-                                else:
-                                    section[i] = (section[i] - y_bar)
-
-                    if self.line_label.text():
-                        # Use custom line label
-                        name = self.line_label.text()
-                    else:
-                        name = f"{y_name} vs {x_name}"
-
-                    new_colours = self.colours[self.cycle]
-                    self.cycle = (self.cycle + 1) % len(self.colours)
-
-                    # add new line to lines
-                    self.lines.insert(0, [
-                        x, y, self.line_button.isChecked(), self.rank_button.isChecked(),
-                        new_colours, name, self.drop_line_type.currentText(), "data"])
-
-                    # update range for models
-                    if self.max is not None:
-                        self.max = max(*x_list, self.max)
-                        self.min = min(*x_list, self.min)
-                    else:
-                        self.max = max(*x_list)
-                        self.min = min(*x_list)
-
-                    # redraw graph
-                    self.graph.clear()
-                    self.generate_graph()
-
-                else:
+                # blank uses the automatic number of bins
+                bin_width = convert_to_number(self.bin_width.text())
+                if bin_width is False or not math.isfinite(bin_width) or (self.bin_width.text() and bin_width <= 0):
                     qtw.QMessageBox.warning(
-                        self, "Type Failure", "The data you selected is not numerical.",
+                        self, "Input Failure", "The smoothing width must be a positive number.",
                         qtw.QMessageBox.StandardButton.Ok)
+                    return
+
+                # blank keeps every point of plots following a file
+                window = convert_to_number(self.live_window.text())
+                if window is False or not math.isfinite(window) or window < 0 or window != int(window):
+                    qtw.QMessageBox.warning(
+                        self, "Input Failure", "The number of points kept must be a whole number.",
+                        qtw.QMessageBox.StandardButton.Ok)
+                    return
+                if self.live_button.isChecked() and self.drop_scale.currentText() != scaling.NO_SCALING:
+                    qtw.QMessageBox.warning(
+                        self, "Input Failure", "Plots that follow a file can't be scaled.",
+                        qtw.QMessageBox.StandardButton.Ok)
+                    return
+
+                # only reads the file again if it has changed
+                dataset = data_func.load_dataset(self.filename)
+                self.request_plot(dataset, self.plot_settings(bin_width, window))
 
         except FileNotFoundError:
             qtw.QMessageBox.warning(
                 self, "No File", "You haven't selected a file or the file you selected has beem moved or deleted.",
                 qtw.QMessageBox.StandardButton.Ok)
+        except reading.READ_ERRORS as error:
+            self.load_failed(None, str(error))
+
+    def plot_settings(self, bin_width, window):
+        """
+        :return: The options chosen in the window for the new plot.
+        """
+
+        return {
+            "x_name": self.drop_x_vals.currentText(),
+            "y_name": self.drop_y_vals.currentText(),
+            "x_func": self.drop_x_func.currentText(),
+            "y_func": self.drop_y_func.currentText(),
+            "scale": self.drop_scale.currentText(),
+            # the degree of the line of best fit, 0 for no line
+            "best_fit": self.fit_degree.value() if self.line_button.isChecked() else 0,
+            "weights_name": self.drop_weights.currentText() if self.drop_weights.currentIndex() > 0 else None,
+            "rank": self.rank_button.isChecked(),
+            "label": self.line_label.text(),
+            "plot_type": self.drop_line_type.currentText(),
+            "bin_width": bin_width or None,
+            "live": self.live_button.isChecked(),
+            "window": int(window) if window else None
+        }
+
+    def request_plot(self, dataset, settings):
+        """
+        Starts preparing a plot in the background with a progress bar.
+        Clicking Add Plot again while the same plot is being prepared doesn't add it twice.
+        """
+
+        key = (dataset.filename, dataset.mtime, tuple(settings.items()))
+        if self.scheduler.is_pending(key):
+            return
+
+        progress_dialog = qtw.QProgressDialog("Reading file...", "Cancel", 0, 100, self)
+        progress_dialog.setWindowTitle("Add Plot")
+        progress_dialog.setMinimumDuration(500)
+        progress_dialog.canceled.connect(partial(self.scheduler.cancel, key))
+        # stored before submitting so the request is known whenever the plot is ready
+        self.requests[key] = settings, dataset, progress_dialog
+        self.scheduler.submit(key, plot_func.prepare_line, dataset, settings, self.polar)
+
+    def show_progress(self, key, percent):
+        if key in self.requests:
+            self.requests[key][2].setValue(percent)
+
+    def request_finished(self, key):
+        _, _, progress_dialog = self.requests.pop(key)
+        progress_dialog.reset()
+        progress_dialog.deleteLater()
+
+    def plot_ready(self, key, data):
+        settings, dataset, _ = self.requests[key]
+        self.plot_data(settings, data, dataset)
+
+    def load_failed(self, _, message):
+        qtw.QMessageBox.warning(
+            self, "Read Failure", f"The file couldn't be read.\n{message}",
+            qtw.QMessageBox.StandardButton.Ok)
+
+    def plot_data(self, settings, data, dataset=None):
+        """
+        Adds a plot of prepared data to the graph.
+        :param settings: The options from plot_settings.
+        :param data: The SectionedData to plot.
+        :param dataset: The Dataset the data was read from, needed for plots that follow the file.
+        """
+
+        if len(data):
+
+            live = None
+            if settings["live"]:
+                try:
+                    live = data_func.LiveData(
+                        dataset, data, settings["x_name"], settings["y_name"], settings["x_func"],
+                        settings["y_func"], settings["weights_name"], settings["window"])
+                except reading.READ_ERRORS as error:
+                    qtw.QMessageBox.warning(
+                        self, "Follow Failure", f"The plot can't follow the file.\n{error}",
+                        qtw.QMessageBox.StandardButton.Ok)
+
+            if settings["label"]:
+                # Use custom line label
+                name = settings["label"]
+            else:
+                name = f"{settings['y_name']} vs {settings['x_name']}"
+
+            new_colours = self.colours[self.cycle]
+            self.cycle = (self.cycle + 1) % len(self.colours)
+
+            old_range = self.x_range()
+
+            # add new line to lines
+            line = graph_lines.DataLine(
+                data, settings["best_fit"], settings["rank"],
+                new_colours, name, settings["plot_type"], settings["bin_width"], live)
+            self.lines.insert(0, line)
+            line.draw(self.graph, self.x_range())
+
+            self.extend_range(data)
+            if self.x_range() != old_range:
+                self.redraw_models()
+            self.update_graph()
+
+            if live is not None and not self.live_timer.isActive():
+                self.live_timer.start()
+
+        else:
+            qtw.QMessageBox.warning(
+                self, "Type Failure", "The data you selected is not numerical.",
+                qtw.QMessageBox.StandardButton.Ok)
+
+    def extend_range(self, data):
+        """
+        Widens the range models are drawn across to include the data.
+        """
+
+        if not len(data):
+            return
+        if self.max is not None:
+            self.max = max(data.x.max(), self.max)
+            self.min = min(data.x.min(), self.min)
+        else:
+            self.max = data.x.max()
+            self.min = data.x.min()
+
+    def refresh_live(self):
+        """
+        Starts reading the rows written since the last refresh for the plots that follow files.
+        """
+
+        live_lines = [line for line in self.lines if isinstance(line, graph_lines.DataLine) and line.live is not None]
+        if not live_lines:
+            self.live_timer.stop()
+            return
+
+        for line in live_lines:
+            # a line still being read from the last refresh isn't read again until it's finished
+            if not self.live_scheduler.is_pending(line):
+                self.live_scheduler.submit(line, line.live.read)
+
+    def live_rows_ready(self, line, rows):
+        """
+        Adds the new rows to a plot that follows a file and draws it again if it changed.
+        """
+
+        # the plot may have been removed while the rows were read
+        if line not in self.lines or line.live is None or not line.follow(rows, self.polar):
+            return
+
+        old_range = self.x_range()
+        line.remove()
+        line.draw(self.graph, self.x_range())
+        self.extend_range(line.data)
+        if self.x_range() != old_range:
+            self.redraw_models()
+        self.update_graph()
+
+    def live_failed(self, line, message):
+        # stop following the file but keep the points already read
+        line.live = None
+        self.load_failed(None, message)
+
+    def closeEvent(self, _):
+        # stop preparing plots that will never be drawn
+        self.scheduler.shutdown()
+        self.live_scheduler.shutdown()
+        self.live_timer.stop()
 
     def clear_graph(self):
         """
@@ -315,31 +483,100 @@ class GraphWindow(qtw.QMainWindow):
         if self.in_window:
             return
 
-        draw_func, label_func, valid_input, args = model_func.models_dict[self.model_drop_down.currentText()]
+        model, label_func, valid_input, args = model_func.models_dict[self.model_drop_down.currentText()]
         colours = self.colours[self.cycle]
         self.cycle = (self.cycle + 1) % len(self.colours)
 
-        self.plot_window = ModelWindow(self, draw_func, label_func, valid_input, colours, *args)
+        self.plot_window = ModelWindow(self, model, label_func, valid_input, colours, *args)
         self.in_window = True
         self.plot_window.show()
 
-    def generate_graph(self):
+    def fit_model(self):
+        """
+        Fits the selected model to a data plot chosen by the user and adds it to the graph.
+        """
+
+        # Prevent multiple popups appearing
+        if self.in_window:
+            return
+
+        data_lines = [line for line in self.lines if isinstance(line, graph_lines.DataLine)]
+        if not data_lines:
+            qtw.QMessageBox.warning(
+                self, "Fit Failure", "Add a plot of data to fit the model to first.",
+                qtw.QMessageBox.StandardButton.Ok)
+            return
+
+        # numbered so plots with the same label can be told apart
+        names = [f"{i + 1}. {line.label}" for i, line in enumerate(data_lines)]
+        name, ok = qtw.QInputDialog.getItem(self, "Fit Model", "Plot to fit:", names, 0, False)
+        if not ok:
+            return
+        data = data_lines[names.index(name)].data
+
+        model, label_func, valid_input, args = model_func.models_dict[self.model_drop_down.currentText()]
+        try:
+            fit = fit_func.fit_model(model, data.x, data.y, len(args))
+        except ValueError as error:
+            qtw.QMessageBox.warning(
+                self, "Fit Failure", f"The model couldn't be fitted.\n{error}",
+                qtw.QMessageBox.StandardButton.Ok)
+            return
+        if not valid_input(*fit.params):
+            qtw.QMessageBox.warning(
+                self, "Fit Failure", "The model doesn't suit the data.",
+                qtw.QMessageBox.StandardButton.Ok)
+            return
+
+        colours = self.colours[self.cycle]
+        self.cycle = (self.cycle + 1) % len(self.colours)
+        line = graph_lines.ModelLine(fit_func.fit_label(label_func, fit), model, fit.params, colours)
+        self.lines.insert(0, line)
+        line.draw(self.graph, self.x_range())
+        self.update_graph()
+
+        results = "\n".join(
+            f"{arg} = {param:.6g} ± {uncertainty:.2g}"
+            for arg, param, uncertainty in zip(args, fit.params, fit.uncertainties))
+        qtw.QMessageBox.information(
+            self, "Fit Model", f"{results}\nR² = {fit.r_squared:.6f}\nFitted to {fit.points} points.")
+
+    def x_range(self):
         """
-        Draws the new plots on the graph and recalculates the models with the updated ranges.
+        :return: The range of x values to draw models across, or None if there is no data.
         """
 
-        self.handles = []
+        if self.max is None:
+            return None
+        return self.min, self.max
+
+    def generate_graph(self):
+        """
+        Draws all the plots on the graph.
+        """
 
         for line in reversed(self.lines):
-            if line[-1] == "data":  # if line is from data
-                # plots data with function in plotting_functions
-                self.graph.general_plot(*line[:-1])
+            line.draw(self.graph, self.x_range())
+        self.update_graph()
 
-            elif self.max is not None:
-                label, draw_func, options, colours, _ = line
-                x, y = draw_func(*options, self.min, self.max)
+    def redraw_models(self):
+        """
+        Redraws the models with the updated range, leaving the data plots as they are.
+        """
+
+        for line in self.lines:
+            if isinstance(line, graph_lines.ModelLine):
+                line.remove()
+                line.draw(self.graph, self.x_range())
 
-                self.graph.line_plot([list(x)], [list(y)], False, False, label, colour=colours)
+    def update_graph(self):
+        """
+        Puts the plots in order and updates the key.
+        """
+
+        for position, line in enumerate(reversed(self.lines)):
+            line.set_position(position)
+        self.graph.update([handle for line in reversed(self.lines) for handle in line.handles])
 
     def edit_lines(self):
         """
@@ -384,7 +621,7 @@ class ModelWindow(qtw.QWidget):
     Gets the information to plot a model.
     """
 
-    def __init__(self, parent, draw_func, label_func, valid_input, model_colours, *options):
+    def __init__(self, parent, model, label_func, valid_input, model_colours, *options):
         super().__init__()
 
         self.parent = parent
@@ -421,7 +658,7 @@ class ModelWindow(qtw.QWidget):
 
         self.colours = model_colours
 
-        self.plot_func, self.label_func = draw_func, label_func
+        self.model, self.label_func = model, label_func
 
     def cancel(self):
         self.parent.in_window = False
@@ -448,10 +685,11 @@ class ModelWindow(qtw.QWidget):
 
         if self.valid_input(*options):
             # add line
-            self.parent.lines.insert(0, [self.label_func(*options), self.plot_func, options, self.colours, "model"])
+            line = graph_lines.ModelLine(self.label_func(*options), self.model, options, self.colours)
+            self.parent.lines.insert(0, line)
+            line.draw(self.parent.graph, self.parent.x_range())
 
-            # redraw graph
-            self.parent.generate_graph()
+            self.parent.update_graph()
             self.cancel()
         else:
             qtw.QMessageBox.warning(
@@ -483,12 +721,7 @@ class LineEditWindow(qtw.QWidget):
         for i, line in enumerate(self.lines):
             self.line_layouts.append(qtw.QHBoxLayout())
 
-            if line[-1] == "data":
-                name = line[5]
-            else:
-                name = line[0]
-
-            self.list_widget.addItem(name)
+            self.list_widget.addItem(line.label)
 
         self.layout.addWidget(self.list_widget)
 
@@ -542,17 +775,13 @@ class LineEditWindow(qtw.QWidget):
             # Converts the colour to hex code
             colour = f"#{r:02x}{g:02x}{b:02x}"
             line = self.lines[current_row]
-            if line[-1] == "data":
-                index = 4
-            else:
-                index = 3
 
             if main_colour:
-                line[index] = [colour, line[index][1]]
+                line.set_colours([colour, line.colours[1]])
             else:
-                line[index] = [line[index][0], colour]
+                line.set_colours([line.colours[0], colour])
 
-            self.redraw_graph()
+            self.parent.update_graph()
 
     def edit_label(self):
 
@@ -565,16 +794,11 @@ class LineEditWindow(qtw.QWidget):
         text, ok = qtw.QInputDialog.getText(self, "Change Label", "New Label:")
 
         if ok:
-            line = self.lines[current_row]
-            if line[-1] == "data":
-                line[5] = text
-            else:
-                line[0] = text
+            self.lines[current_row].set_label(text)
+            self.parent.update_graph()
 
-        self.redraw_graph()
-
-        self.list_widget.takeItem(current_row)
-        self.list_widget.insertItem(current_row, text)
+            self.list_widget.takeItem(current_row)
+            self.list_widget.insertItem(current_row, text)
 
     def move_line(self, up):
         """
@@ -600,7 +824,8 @@ class LineEditWindow(qtw.QWidget):
         self.list_widget.insertItem(new_row, item)
         self.list_widget.setCurrentRow(new_row)
 
-        self.redraw_graph()
+        # only the drawing order changes
+        self.parent.update_graph()
 
     def delete_line(self):
         """
@@ -613,14 +838,10 @@ class LineEditWindow(qtw.QWidget):
         if currently_selected is None or not currently_selected.isSelected():  # checks an item is selected
             return
 
-        self.lines.pop(current_row)
+        self.lines.pop(current_row).remove()
         self.list_widget.takeItem(current_row)
 
-        self.redraw_graph()
-
-    def redraw_graph(self):
-        self.parent.graph.clear()
-        self.parent.generate_graph()
+        self.parent.update_graph()
 
     def custom_close(self):
         self.parent.in_window = False
@@ -727,8 +948,8 @@ class RangeWindow(qtw.QWidget):
             self.parent.min = val1
             self.parent.max = val2
 
-            self.parent.graph.clear()
-            self.parent.generate_graph()
+            self.parent.redraw_models()
+            self.parent.update_graph()
             self.custom_close()
         else:
             qtw.QMessageBox.warning(
@@ -0,0 +1,323 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import data_functions as data_func
+import fitting_functions as fit_func
+import model_functions as model_func
+import plotting_functions as plot_func
+import scaling_functions as scaling
+import transforming_functions as transform_func
+import graphing_colours as colours
+import graphing_lines as graph_lines
+from graphing_interface import NormalGraph, PolarGraph
+
+
+"""
+This is the file for making graphs without a window and saving them as images, eg. for overnight jobs.
+It doesn't need PyQt6, the graphs are drawn with matplotlib's Agg backend.
+
+Run it with one or more figure files:
+   python graphing_batch.py figures.json
+A figure file is a JSON file with one figure, a list of figures or {"figures": [...]}.
+Each figure has any of the keys in DEFAULT_FIGURE, "output" is the image to save to,
+the type of image comes from the extension (.png, .svg or .pdf).
+Each item in "plots" has any of the keys in DEFAULT_PLOT and each item in "models" any of the keys in DEFAULT_MODEL.
+The names of the functions, scalings, plot types and models are the ones in the dropdowns in graphing.py, eg.
+
+{
+   "output": "speed.png",
+   "title": "Speed", "x_label": "time (s)", "y_label": "speed (m/s)",
+   "plots": [{"file": "run.csv", "x": "time", "y": "speed", "type": "Scatter", "best_fit": 1}],
+   "models": [{"equation": "y = ar^x + c", "fit": 0}]
+}
+
+A model has either "inputs", the values of its inputs, or "fit", the index of the plot to fit it to.
+The plots of every figure are read and prepared at the same time in a pool of threads,
+then the figures are drawn and saved one at a time.
+"""
+
+
+FORMATS = (".png", ".svg", ".pdf")
+
+DEFAULT_FIGURE = {
+    "output": None,
+    "polar": False,
+    "title": "",
+    "x_label": "",
+    "y_label": "",
+    # the range of x values to draw models across, the range of the data if None
+    "range": None,
+    "dpi": 100,
+    "plots": [],
+    "models": []
+}
+
+DEFAULT_PLOT = {
+    "file": None,
+    "x": None,
+    "y": None,
+    "x_func": "x: x",
+    "y_func": "x: x",
+    "scale": scaling.NO_SCALING,
+    "type": "Scatter",
+    # the degree of the line of best fit, 0 for no line
+    "best_fit": 0,
+    "weights": None,
+    "rank": False,
+    "bin_width": None,
+    "label": "",
+    # the main and secondary colour, the next colours from graphing_colours.py if None
+    "colours": None
+}
+
+DEFAULT_MODEL = {
+    "equation": None,
+    "inputs": None,
+    "fit": None,
+    "label": None,
+    "colours": None
+}
+
+
+def load_figures(filename):
+    """
+    :param filename: The path to a figure file.
+    :return: A list of each figure in the file and the folder its files are found relative to.
+    """
+
+    with open(filename, "r") as file:
+        figures = json.load(file)
+    if isinstance(figures, dict):
+        figures = figures.get("figures", [figures])
+    if not isinstance(figures, list):
+        raise ValueError(f"{filename} must have a figure or a list of figures.")
+
+    # files are found relative to the figure file
+    folder = os.path.dirname(os.path.abspath(filename))
+    return [(figure, folder) for figure in figures]
+
+
+def complete_figure(figure, folder):
+    """
+    :param figure: A figure from a figure file.
+    :param folder: The folder the figure's files are found relative to.
+    :return: The figure with any missing keys set to their defaults.
+    """
+
+    if not isinstance(figure, dict):
+        raise ValueError("Each figure must be a JSON object.")
+    figure = dict(DEFAULT_FIGURE, **figure)
+    for key, defaults in (("plots", DEFAULT_PLOT), ("models", DEFAULT_MODEL)):
+        if not isinstance(figure[key], list) or not all(isinstance(item, dict) for item in figure[key]):
+            raise ValueError(f"The {key} must be a list of JSON objects.")
+        figure[key] = [dict(defaults, **item) for item in figure[key]]
+
+    for plot in figure["plots"]:
+        if isinstance(plot["file"], str):
+            plot["file"] = os.path.join(folder, plot["file"])
+    if isinstance(figure["output"], str):
+        figure["output"] = os.path.join(folder, figure["output"])
+    return figure
+
+
+def is_number(value):
+    # bools are ints in Python but true and false aren't numbers in a figure file
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_index(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def check_figure(figure):
+    """
+    Checks the options of a figure before anything is read.
+    Raises ValueError describing the first problem found.
+    """
+
+    if not isinstance(figure["output"], str) or os.path.splitext(figure["output"])[1].lower() not in FORMATS:
+        raise ValueError(f"The output must be a {', '.join(FORMATS)} file.")
+    if not is_number(figure["dpi"]) or figure["dpi"] <= 0:
+        raise ValueError("The dpi must be a positive number.")
+    if figure["range"] is not None and (not isinstance(figure["range"], list) or len(figure["range"]) != 2
+                                        or not all(is_number(value) for value in figure["range"])):
+        raise ValueError("The range must be a list of two numbers.")
+
+    for plot in figure["plots"]:
+        if not all(isinstance(plot[key], str) for key in ("file", "x", "y")):
+            raise ValueError("Each plot needs a file, x and y.")
+        for key, options in (("x_func", transform_func.function_dict), ("y_func", transform_func.function_dict),
+                             ("scale", scaling.scaling_dict), ("type", plot_func.plotting_dict)):
+            if not isinstance(plot[key], str) or plot[key] not in options:
+                raise ValueError(f"{plot[key]} isn't a {key}, the options are: {', '.join(options)}")
+        if not is_index(plot["best_fit"]) or plot["best_fit"] < 0:
+            raise ValueError("The best_fit degree must be a whole number, 0 for no line.")
+        if plot["bin_width"] is not None and (not is_number(plot["bin_width"]) or plot["bin_width"] <= 0):
+            raise ValueError("The bin_width must be a positive number.")
+        if plot["weights"] is not None and not isinstance(plot["weights"], str):
+            raise ValueError("The weights must be the name of a column.")
+
+    for model in figure["models"]:
+        if not isinstance(model["equation"], str) or model["equation"] not in model_func.models_dict:
+            raise ValueError(f"{model['equation']} isn't a model, the options are: {', '.join(model_func.models_dict)}")
+        _, _, valid_input, args = model_func.models_dict[model["equation"]]
+        if model["fit"] is None:
+            if (not isinstance(model["inputs"], list) or len(model["inputs"]) != len(args)
+                    or not all(is_number(value) for value in model["inputs"]) or not valid_input(*model["inputs"])):
+                raise ValueError(f"{model['equation']} needs valid numbers for {', '.join(args)}.")
+        elif not is_index(model["fit"]) or not 0 <= model["fit"] < len(figure["plots"]):
+            raise ValueError(f"There is no plot {model['fit']} to fit {model['equation']} to.")
+
+
+def plot_settings(plot):
+    """
+    :return: The settings for plotting_functions.prepare_line, like the ones from GraphWindow.plot_settings.
+    """
+
+    return {
+        "x_name": plot["x"],
+        "y_name": plot["y"],
+        "x_func": plot["x_func"],
+        "y_func": plot["y_func"],
+        "scale": plot["scale"],
+        "best_fit": int(plot["best_fit"]),
+        "weights_name": plot["weights"],
+        "rank": plot["rank"],
+        "label": plot["label"],
+        "plot_type": plot["type"],
+        "bin_width": plot["bin_width"] or None,
+        "live": False,
+        "window": None
+    }
+
+
+def read_plot(plot, polar):
+    dataset = data_func.load_dataset(plot["file"])
+    return plot_func.prepare_line(dataset, plot_settings(plot), polar)
+
+
+def next_colours(lines):
+    return colours.colours[len(lines) % len(colours.colours)]
+
+
+def draw_figure(figure, prepared):
+    """
+    Draws a figure and saves it.
+    :param figure: The figure options.
+    :param prepared: The SectionedData of each plot.
+    """
+
+    graph = PolarGraph(interactive=False) if figure["polar"] else NormalGraph(interactive=False)
+    try:
+        if figure["polar"]:
+            graph.set_title(figure["title"])
+        else:
+            graph.set_titles(figure["title"], figure["x_label"], figure["y_label"])
+
+        # each line takes the next colours like in graphing.py, unless its colours are chosen
+        lines = []
+
+        for plot, data in zip(figure["plots"], prepared):
+            if not len(data):
+                raise ValueError(f"{plot['y']} vs {plot['x']} in {plot['file']} has no numeric points.")
+            label = plot["label"] or f"{plot['y']} vs {plot['x']}"
+            lines.append(graph_lines.DataLine(
+                data, plot_settings(plot)["best_fit"], plot["rank"], plot["colours"] or next_colours(lines),
+                label, plot["type"], plot["bin_width"] or None))
+
+        x_range = figure["range"]
+        if x_range is None and prepared:
+            x_range = (min(data.x.min() for data in prepared), max(data.x.max() for data in prepared))
+
+        for model in figure["models"]:
+            function, label_func, valid_input, args = model_func.models_dict[model["equation"]]
+            if model["fit"] is None:
+                inputs, label = model["inputs"], label_func(*model["inputs"])
+            else:
+                data = prepared[model["fit"]]
+                fit = fit_func.fit_model(function, data.x, data.y, len(args))
+                if not valid_input(*fit.params):
+                    raise ValueError(f"{model['equation']} doesn't suit plot {model['fit']}.")
+                inputs, label = fit.params, fit_func.fit_label(label_func, fit)
+            lines.append(graph_lines.ModelLine(
+                model["label"] or label, function, inputs, model["colours"] or next_colours(lines)))
+
+        for position, line in enumerate(lines):
+            line.draw(graph, x_range)
+            line.set_position(position)
+        graph.update([handle for line in lines for handle in line.handles])
+        graph.fig.savefig(figure["output"], dpi=figure["dpi"])
+    finally:
+        plt.close(graph.fig)
+
+
+def figure_name(figure, number):
+    """
+    :return: The name to report a figure by, its output if it has one.
+    """
+
+    if isinstance(figure, dict) and isinstance(figure.get("output"), str):
+        return figure["output"]
+    return f"figure {number + 1}"
+
+
+def render(figures, workers=None):
+    """
+    Draws and saves figures, carrying on with the rest if one can't be made.
+    :param figures: The figures and folders from load_figures.
+    :param workers: The number of threads to read and prepare the plots with.
+    :return: The number of figures that couldn't be made.
+    """
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # start preparing every plot so they are read while earlier figures are drawn
+        jobs = []
+        for figure, folder in figures:
+            try:
+                figure = complete_figure(figure, folder)
+                check_figure(figure)
+                jobs.append((figure, [pool.submit(read_plot, plot, figure["polar"]) for plot in figure["plots"]]))
+            except ValueError as error:
+                jobs.append((figure, error))
+
+        for number, (figure, job) in enumerate(jobs):
+            # any error only stops the figure it is in, the rest of the batch is still made
+            try:
+                if isinstance(job, Exception):
+                    raise job
+                draw_figure(figure, [future.result() for future in job])
+                print(f"Saved {figure['output']}")
+            except Exception as error:
+                failures += 1
+                print(f"Couldn't make {figure_name(figure, number)}: {error}", file=sys.stderr)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Make graphs from figure files without a window.")
+    parser.add_argument("figures", nargs="+", help="the JSON figure files")
+    parser.add_argument("--workers", type=int, default=None, help="the number of threads to read files with")
+    arguments = parser.parse_args()
+
+    figures = []
+    failures = 0
+    for filename in arguments.figures:
+        try:
+            figures += load_figures(filename)
+        except (OSError, ValueError) as error:
+            failures += 1
+            print(f"Couldn't read {filename}: {error}", file=sys.stderr)
+
+    failures += render(figures, arguments.workers)
+    if failures:
+        sys.exit(f"{failures} figure files or figures couldn't be made.")
+
+
+if __name__ == "__main__":
+    main()
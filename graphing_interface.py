@@ -1,15 +1,28 @@
 import random
+import time
 import matplotlib.pyplot as plt
 import matplotlib.ticker as tck
 import matplotlib.cm as cm
+from matplotlib.collections import LineCollection
 import numpy as np
 import graphing_colours as colours
 import plotting_functions as plot_func
+from simulation_functions import RateCounter
+
+
+# the style was renamed in matplotlib 3.6 and the old name was removed in 3.8
+STYLE = "seaborn-v0_8-whitegrid" if "seaborn-v0_8-whitegrid" in plt.style.available else "seaborn-whitegrid"
 
 
 class NormalGraph:
-    def __init__(self):
-        plt.style.use("seaborn-whitegrid")
+    def __init__(self, interactive=True):
+        """
+        :param interactive: If the graph is shown in a window, False when only saving the graph to a file.
+        """
+
+        self.interactive = interactive
+        self.polar = False
+        plt.style.use(STYLE)
         self.fig, self.ax = plt.subplots(figsize=(14, 10), layout="constrained")
         self.cycle = 0
         self.colours = colours.colours
@@ -19,9 +32,8 @@ class NormalGraph:
         self.y_label = ""
 
         self.redraw_graph()
-        self.handles = []
         plt.draw()
-        plt.pause(0.01)
+        self.pause()
 
     def redraw_graph(self):
         self.ax.xaxis.set_minor_locator(tck.AutoMinorLocator())
@@ -35,7 +47,7 @@ class NormalGraph:
         self.ax.set_xlabel(self.x_label)
         self.ax.set_ylabel(self.y_label)
 
-        plt.pause(0.01)
+        self.pause()
 
     def set_titles(self, title, x_label, y_label):
         self.title = title
@@ -43,46 +55,69 @@ class NormalGraph:
         self.y_label = y_label
         self.redraw_graph()
 
-    def general_plot(self, x, y, lobf, rank, colour, label, plot_name):
+    def general_plot(self, data, lobf, rank, colour, label, plot_name, bin_width=None):
         match plot_name:
             case "Scatter":
-                self.scatter_plot(x, y, lobf, rank, label, colour=colour)
+                return self.scatter_plot(data, lobf, rank, label, colour=colour)
             case "Line":
-                self.line_plot(x, y, lobf, rank, label, colour=colour)
+                return self.line_plot(data, lobf, rank, label, colour=colour)
             case "Smoothed Line":
-                self.smooth_plot(x, y, lobf, rank, label, colour=colour)
+                return self.smooth_plot(data, lobf, rank, label, colour=colour, bin_width=bin_width)
+        return []
 
-    def scatter_plot(self, x, y, lobf, rank, label, colour=None):
+    def scatter_plot(self, data, lobf, rank, label, colour=None):
         if colour is None:
-            self.handles += plot_func.scatter_plot(x, y, lobf, rank, self.colours[self.cycle], label, False)
+            handles = plot_func.scatter_plot(data, lobf, rank, self.colours[self.cycle], label, False)
             self.cycle += 1
         else:
-            self.handles += plot_func.scatter_plot(x, y, lobf, rank, colour, label, False)
-        self.ax.legend(handles=self.handles)
-        self.redraw_graph()
+            handles = plot_func.scatter_plot(data, lobf, rank, colour, label, False)
+        return handles
 
-    def line_plot(self, x, y, lobf, rank, label, colour=None):
+    def line_plot(self, data, lobf, rank, label, colour=None):
         if colour is None:
-            self.handles += plot_func.line_plot(x, y, lobf, rank, self.colours[self.cycle], label, False)
+            handles = plot_func.line_plot(data, lobf, rank, self.colours[self.cycle], label, False)
             self.cycle += 1
         else:
-            self.handles += plot_func.line_plot(x, y, lobf, rank, colour, label, False)
-        self.ax.legend(handles=self.handles)
-        self.redraw_graph()
+            handles = plot_func.line_plot(data, lobf, rank, colour, label, False)
+        return handles
 
-    def smooth_plot(self, x, y, lobf, rank, label, colour=None):
+    def smooth_plot(self, data, lobf, rank, label, colour=None, bin_width=None):
         if colour is None:
-            self.handles += plot_func.smoothed_plot(x, y, lobf, rank, self.colours[self.cycle], label, False)
+            handles = plot_func.smoothed_plot(data, lobf, rank, self.colours[self.cycle], label, False, bin_width)
             self.cycle += 1
         else:
-            self.handles += plot_func.smoothed_plot(x, y, lobf, rank, colour, label, False)
-        self.ax.legend(handles=self.handles)
-        self.redraw_graph()
+            handles = plot_func.smoothed_plot(data, lobf, rank, colour, label, False, bin_width)
+        return handles
+
+    def update(self, handles):
+        """
+        Rescales the graph to fit the plots and updates the key.
+        :param handles: The handles to show in the key.
+        """
+
+        self.ax.relim()
+        self.ax.autoscale_view()
+        if handles:
+            self.ax.legend(handles=handles)
+        elif self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+        self.pause()
+
+    def pause(self):
+        # lets the window draw, there is no window to draw when only saving to a file
+        if self.interactive:
+            plt.pause(0.01)
+
+    def pixel_size(self):
+        """
+        :return: The width and height of the axes in pixels.
+        """
+
+        return self.ax.bbox.width, self.ax.bbox.height
 
     def clear(self):
         self.ax.clear()
         self.cycle = 0
-        self.handles = []
         self.redraw_graph()
 
     def freeze(self):
@@ -91,18 +126,19 @@ class NormalGraph:
 
 
 class PolarGraph:
-    def __init__(self):
-        plt.style.use("seaborn-whitegrid")
+    def __init__(self, interactive=True):
+        self.interactive = interactive
+        self.polar = True
+        plt.style.use(STYLE)
         self.fig, self.ax = plt.subplots(figsize=(11, 11), layout="constrained", subplot_kw={"projection": "polar"})
         self.cycle = 0
         self.colours = colours.colours
 
         self.title = ""
 
-        self.handles = []
         self.redraw_graph()
         plt.draw()
-        plt.pause(0.01)
+        self.pause()
 
     def set_title(self, title):
         self.title = title
@@ -122,48 +158,71 @@ class PolarGraph:
         plt.grid(linewidth=0.8, color="darkgrey")
         plt.grid(linewidth=0.4, color="gainsboro", which="minor")
 
-        plt.pause(0.01)
+        self.pause()
 
-    def general_plot(self, x, y, lobf, rank, colour, label, plot_name):
+    def general_plot(self, data, lobf, rank, colour, label, plot_name, bin_width=None):
         match plot_name:
             case "Scatter":
-                self.scatter_plot(x, y, lobf, rank, label, colour=colour)
+                return self.scatter_plot(data, lobf, rank, label, colour=colour)
             case "Line":
-                self.line_plot(x, y, lobf, rank, label, colour=colour)
+                return self.line_plot(data, lobf, rank, label, colour=colour)
             case "Smoothed Line":
-                self.smooth_plot(x, y, lobf, rank, label, colour=colour)
+                return self.smooth_plot(data, lobf, rank, label, colour=colour, bin_width=bin_width)
+        return []
 
-    def scatter_plot(self, x, y, lobf, rank, label, colour=None):
+    def scatter_plot(self, data, lobf, rank, label, colour=None):
         if colour is None:
-            self.handles += plot_func.scatter_plot(x, y, lobf, rank, self.colours[self.cycle], label, True)
+            handles = plot_func.scatter_plot(data, lobf, rank, self.colours[self.cycle], label, True)
             self.cycle += 1
         else:
-            self.handles += plot_func.scatter_plot(x, y, False, False, colour, label, True)
-        self.ax.legend(handles=self.handles)
-        self.redraw_graph()
+            handles = plot_func.scatter_plot(data, False, False, colour, label, True)
+        return handles
 
-    def line_plot(self, x, y, lobf, rank, label, colour=None):
+    def line_plot(self, data, lobf, rank, label, colour=None):
         if colour is None:
-            self.handles += plot_func.line_plot(x, y, lobf, rank, self.colours[self.cycle], label, True)
+            handles = plot_func.line_plot(data, lobf, rank, self.colours[self.cycle], label, True)
             self.cycle += 1
         else:
-            self.handles += plot_func.line_plot(x, y, lobf, rank, colour, label, True)
-        self.ax.legend(handles=self.handles)
-        self.redraw_graph()
+            handles = plot_func.line_plot(data, lobf, rank, colour, label, True)
+        return handles
 
-    def smooth_plot(self, x, y, lobf, rank, label, colour=None):
+    def smooth_plot(self, data, lobf, rank, label, colour=None, bin_width=None):
         if colour is None:
-            self.handles += plot_func.smoothed_plot(x, y, lobf, rank, self.colours[self.cycle], label, True)
+            handles = plot_func.smoothed_plot(data, lobf, rank, self.colours[self.cycle], label, True, bin_width)
             self.cycle += 1
         else:
-            self.handles += plot_func.smoothed_plot(x, y, lobf, rank, colour, label, True)
-        self.ax.legend(handles=self.handles)
-        self.redraw_graph()
+            handles = plot_func.smoothed_plot(data, lobf, rank, colour, label, True, bin_width)
+        return handles
+
+    def update(self, handles):
+        """
+        Rescales the graph to fit the plots and updates the key.
+        :param handles: The handles to show in the key.
+        """
+
+        self.ax.relim()
+        self.ax.autoscale_view()
+        if handles:
+            self.ax.legend(handles=handles)
+        elif self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+        self.pause()
+
+    def pause(self):
+        # lets the window draw, there is no window to draw when only saving to a file
+        if self.interactive:
+            plt.pause(0.01)
+
+    def pixel_size(self):
+        """
+        :return: The width and height of the axes in pixels.
+        """
+
+        return self.ax.bbox.width, self.ax.bbox.height
 
     def clear(self):
         self.ax.clear()
         self.cycle = 0
-        self.handles = []
         self.redraw_graph()
 
     def freeze(self):
@@ -171,12 +230,22 @@ class PolarGraph:
             self.redraw_graph()
 
 
+# the most time in seconds drawing can fall behind before frames stop being skipped to catch up
+MAX_LAG = 0.25
+
+
 class Animation2DWindow:
-    def __init__(self, size, object_count):
+    """
+    A window that animates circles by blitting, only redrawing the circles and not the axes each frame.
+    Frames are drawn at target_fps, frames that arrive while drawing has fallen behind are skipped.
+    Trails of the last trail_length positions of each circle can be drawn behind them.
+    """
+
+    def __init__(self, size, object_count, target_fps=60, trail_length=0):
         self.circles = []
         self.size = size
 
-        plt.style.use("seaborn-whitegrid")
+        plt.style.use(STYLE)
         self.fig, self.ax = plt.subplots(figsize=(10, 10), layout="constrained")
         plt.gca().set_aspect('equal')
         self.cycle = 0
@@ -190,10 +259,32 @@ class Animation2DWindow:
         c = np.linspace(0, 1, object_count)
         s = [1] * object_count
         self.ln = self.ax.scatter(x, y, c=c, s=s, animated=True, cmap=cm.jet)
+        # the sizes are only recalculated when the radii change
+        self.radii = None
+
+        # past positions are kept in a ring buffer, positions not filled yet are nan so aren't drawn
+        self.trail = None
+        if trail_length:
+            self.trail = np.full((trail_length, object_count, 2), np.nan)
+            # a line for each circle is much faster to draw than a marker at each past position
+            self.trail_artist = LineCollection([], colors=cm.jet(c), linewidths=1, alpha=0.5, animated=True)
+            self.ax.add_collection(self.trail_artist)
+        self.trail_index = 0
+
+        self.frame_time = 1 / target_fps
+        self.next_frame = None
+        self.frames = RateCounter()
+        self.skipped = 0
+
+        # the background is copied again whenever the whole figure is drawn, eg. after resizing
+        self.bg = None
+        self.fig.canvas.mpl_connect("draw_event", self.copy_background)
         plt.show(block=False)
-        plt.pause(0.01)
-        self.bg = self.fig.canvas.copy_from_bbox(self.fig.bbox)
-        self.fig.canvas.blit(self.fig.bbox)
+        self.fig.canvas.draw()
+        self.fig.canvas.flush_events()
+
+    def copy_background(self, _=None):
+        self.bg = self.fig.canvas.copy_from_bbox(self.ax.bbox)
 
     def redraw_graph(self):
         self.ax.xaxis.set_minor_locator(tck.AutoMinorLocator())
@@ -205,16 +296,78 @@ class Animation2DWindow:
 
     def draw_circles(self, xy, r):
         self.fig.canvas.restore_region(self.bg)
-        r = (r / self.size * 680) ** 2
+
+        if self.trail is not None:
+            # put the ring buffer in order, oldest position first
+            start = self.trail_index % len(self.trail)
+            ordered = np.concatenate((self.trail[start:], self.trail[:start]))
+            self.trail_artist.set_segments(ordered.swapaxes(0, 1))
+            self.ax.draw_artist(self.trail_artist)
+
+        if self.radii is None or not np.array_equal(r, self.radii):
+            self.radii = np.array(r)
+            self.ln.set_sizes((self.radii / self.size * 680) ** 2)
         self.ln.set_offsets(xy)
-        self.ln.set_sizes(r)
         self.ax.draw_artist(self.ln)
-        self.fig.canvas.blit(self.fig.bbox)
+
+        # only the axes have changed
+        self.fig.canvas.blit(self.ax.bbox)
         self.fig.canvas.flush_events()
-        plt.pause(0.01)
 
     def process_frame(self, xy, r):
+        """
+        Draws the circles at new positions, unless drawing has fallen more than a frame behind.
+        Each call is one frame, call wait_for_next_frame after a frame is drawn to keep to target_fps.
+        :param xy: Array of the (x, y) position of each circle.
+        :param r: Array of the radius of each circle.
+        :return: If the frame was drawn.
+        """
+
+        if self.trail is not None:
+            self.trail[self.trail_index % len(self.trail)] = xy
+            self.trail_index += 1
+
+        # each frame has a time it is due, if drawing is too far behind to catch up it starts again from now
+        now = time.perf_counter()
+        if self.next_frame is None or now - self.next_frame > MAX_LAG:
+            self.next_frame = now
+        due = self.next_frame
+        self.next_frame += self.frame_time
+
+        if now > due + self.frame_time:
+            # skip this frame to catch up
+            self.skipped += 1
+            return False
+
         self.draw_circles(xy, r)
+        self.frames.tick()
+        return True
+
+    def wait_for_next_frame(self):
+        """
+        Keeps the window responding until the next frame is due.
+        """
+
+        if self.next_frame is None:
+            return
+        self.wait(max(self.next_frame - time.perf_counter(), 0.001))
+
+    def wait(self, seconds):
+        """
+        Keeps the window responding while waiting.
+        """
+
+        self.fig.canvas.start_event_loop(seconds)
+
+    def fps(self):
+        """
+        :return: The number of frames drawn each second over the last few seconds.
+        """
+
+        return self.frames.rate()
+
+    def is_open(self):
+        return plt.fignum_exists(self.fig.number)
 
     def freeze(self):
         while True:
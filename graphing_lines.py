@@ -0,0 +1,146 @@
+from abc import ABC, abstractmethod
+import plotting_functions as plot_func
+import sampling_functions as sampling
+from data_functions import SectionedData
+
+
+"""
+This is the file for the plots that are on the graph.
+
+Each plot keeps the matplotlib artists that draw it,
+so changing its colour, label or order only edits those artists rather than redrawing the whole graph.
+"""
+
+
+def set_colour(artist, colour):
+    if hasattr(artist, "set_color"):
+        artist.set_color(colour)
+    else:
+        artist.set_facecolor(colour)
+
+
+class Line(ABC):
+    """
+    A plot on the graph and the artists drawing it.
+    """
+
+    def __init__(self, label, colours):
+        self.label = label
+        self.colours = colours
+
+        self.artists = []
+        self.handles = []
+        self.zorders = []
+        self.colour_indexes = []
+        self.label_suffix = ""
+
+    @abstractmethod
+    def plot(self, graph, x_range):
+        """
+        Plots the line on the graph.
+        :return: The handles to add to the key.
+        """
+
+    def draw(self, graph, x_range):
+        """
+        Draws the line and keeps the artists it adds to the graph.
+        :param graph: The NormalGraph or PolarGraph to draw on.
+        :param x_range: The minimum and maximum x values of the data, or None if there is no data.
+        """
+
+        before = set(graph.ax.get_children())
+        self.handles = self.plot(graph, x_range)
+        self.artists = [artist for artist in graph.ax.get_children() if artist not in before]
+
+        self.zorders = [artist.get_zorder() for artist in self.artists]
+        # the plotting functions mark which of the colours each artist is drawn in
+        self.colour_indexes = [getattr(artist, "colour_index", None) for artist in self.artists]
+        # the first handle is labelled with the line label, eg. followed by pearson's r
+        if self.handles:
+            self.label_suffix = self.handles[0].get_label()[len(self.label):]
+
+    def remove(self):
+        """
+        Removes the line's artists from the graph.
+        """
+
+        for artist in self.artists:
+            level_of_detail = getattr(artist, "level_of_detail", None)
+            if level_of_detail is not None:
+                level_of_detail.remove()
+            artist.remove()
+        self.artists = []
+        self.handles = []
+
+    def set_colours(self, colours):
+        for artist, index in zip(self.artists, self.colour_indexes):
+            if index is not None:
+                set_colour(artist, colours[index])
+        self.colours = colours
+
+    def set_label(self, label):
+        self.label = label
+        if self.handles:
+            self.handles[0].set_label(label + self.label_suffix)
+
+    def set_position(self, position):
+        """
+        Moves the line in front of lines with lower positions.
+        """
+
+        for artist, zorder in zip(self.artists, self.zorders):
+            artist.set_zorder(zorder + position * 0.001)
+
+
+class DataLine(Line):
+    """
+    A plot of data from a file.
+    """
+
+    def __init__(self, data, best_fit, rank, colours, label, plot_type, bin_width=None, live=None):
+        super().__init__(label, colours)
+        self.data = data
+        self.best_fit = best_fit
+        self.rank = rank
+        self.plot_type = plot_type
+        self.bin_width = bin_width
+        # the LiveData adding rows to the points for plots of files that are still being written
+        self.live = live
+
+    def plot(self, graph, x_range):
+        return graph.general_plot(
+            self.data, self.best_fit, self.rank, self.colours, self.label, self.plot_type, self.bin_width)
+
+    def follow(self, rows, polar):
+        """
+        Adds the rows written to the file since it was last read to the points.
+        The line of best fit is updated from the changed points rather than calculated again.
+        :param rows: The new rows from LiveData.read.
+        :return: If any points were added or removed, so the line needs drawing again.
+        """
+
+        fit = plot_func.cached_fit(self.data, self.plot_type, self.best_fit, self.rank, polar)
+        added, removed = self.live.apply(rows)
+        if not len(added) and not len(removed):
+            return False
+        if fit is not None:
+            plot_func.update_fit(fit, self.data, self.plot_type, self.best_fit, polar, added, removed)
+        return True
+
+
+class ModelLine(Line):
+    """
+    A plot of a model drawn across the range of the data.
+    """
+
+    def __init__(self, label, model, options, colours):
+        super().__init__(label, colours)
+        self.model = model
+        self.options = options
+
+    def plot(self, graph, x_range):
+        if x_range is None:
+            return []
+        x, y = sampling.evaluate(
+            self.model, self.options, x_range, graph.pixel_size(), graph.polar, graph.ax.get_ylim())
+        return graph.line_plot(SectionedData(x, y), False, False, self.label, colour=self.colours)
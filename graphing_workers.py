@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from PyQt6 import QtCore as qtc
+import reading_functions as reading
+
+
+"""
+This is the file for work that runs in the background so the windows don't freeze.
+
+Plots are prepared in a pool of threads with prepare_line from plotting_functions.py: the columns are read,
+transformed and scaled, and the lines of best fit and smoothed lines are calculated and cached.
+Only drawing the prepared plot happens in the window's thread.
+"""
+
+
+class PlotScheduler(qtc.QObject):
+    """
+    Prepares plots in a pool of threads and sends the results back to the window with signals.
+    A request with the same key as one that is still being prepared is merged into it.
+
+    Tasks are called with the keyword arguments progress, a function to report the fraction done,
+    and cancelled, a function that returns True if the task has been cancelled.
+    """
+
+    progress = qtc.pyqtSignal(object, int)
+    ready = qtc.pyqtSignal(object, object)
+    failed = qtc.pyqtSignal(object, str)
+    finished = qtc.pyqtSignal(object)
+
+    # used to move results from the worker threads to the thread the scheduler belongs to
+    task_done = qtc.pyqtSignal(object, object)
+
+    def __init__(self, workers=None):
+        super().__init__()
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.pending = {}
+        # queued so tasks are always finished from the event loop, even if they were done before submit returned
+        self.task_done.connect(self.finish_task, qtc.Qt.ConnectionType.QueuedConnection)
+
+    def submit(self, key, task, *args):
+        """
+        Starts preparing a plot.
+        :param key: A hashable key for the request.
+        :param task: The function to run.
+        :param args: The arguments for the function.
+        :return: False if a request with the same key is already being prepared.
+        """
+
+        if key in self.pending:
+            return False
+
+        cancel_event = threading.Event()
+        self.pending[key] = cancel_event
+        future = self.pool.submit(
+            task, *args,
+            progress=lambda fraction: self.progress.emit(key, round(fraction * 100)),
+            cancelled=cancel_event.is_set)
+        future.add_done_callback(partial(self.task_done.emit, key))
+        return True
+
+    def cancel(self, key):
+        if key in self.pending:
+            self.pending[key].set()
+
+    def is_pending(self, key):
+        return key in self.pending
+
+    def finish_task(self, key, future):
+        del self.pending[key]
+        try:
+            result = future.result()
+        except reading.LoadCancelled:
+            pass
+        except Exception as error:
+            # any error from preparing a plot is shown to the user, an error in a Qt slot would close the program
+            self.failed.emit(key, str(error) or type(error).__name__)
+        else:
+            self.ready.emit(key, result)
+        finally:
+            # so the progress dialog is always closed
+            self.finished.emit(key)
+
+    def shutdown(self):
+        for cancel_event in self.pending.values():
+            cancel_event.set()
+        self.pool.shutdown(wait=False)
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import trajectory_functions as trajectory
+from gravity_functions import AU, SOLAR_SYSTEM_NAMES, Simulation, solar_system
+
+
+"""
+This is the file for running the gravity simulation without a window, as fast as possible,
+and saving the paths of the bodies to a .traj file (see trajectory_functions.py).
+
+Run it with the file to save to and a scenario file:
+   python gravity_batch.py output.traj scenario.json
+and add --resume to carry on from the last checkpoint of a run that was stopped.
+The .traj file can be replayed with gravity_2D_sim.py --replay output.traj,
+or opened in graphing.py to plot the paths.
+
+A scenario is a JSON file with any of the keys in DEFAULT_SCENARIO, the bodies can be "solar system"
+or a list of [x, y, x velocity, y velocity, mass] for each body, in metres, seconds and kilograms.
+"""
+
+
+DEFAULT_SCENARIO = {
+    "bodies": "solar system",
+    "names": None,
+    "radii": None,
+    "integrator": "Leapfrog",
+    "solver": "Direct",
+    "theta": 0.5,
+    "softening": 0.0,
+    # the time step and the total time to simulate in seconds
+    "dt": 2000,
+    "duration": 365.25 * 86400,
+    # only every record_every steps are saved
+    "record_every": 10,
+    "chunk_frames": 1024,
+    # the length that positions are drawn relative to when replaying
+    "scale": AU
+}
+
+# the keys that can be changed when carrying on from a checkpoint, eg. to run for longer
+RESUMABLE_KEYS = ("duration", "chunk_frames")
+
+
+def load_scenario(filename):
+    """
+    :param filename: The path to the scenario file, or None for the default scenario.
+    :return: The scenario with any missing keys set to their defaults.
+    """
+
+    scenario = dict(DEFAULT_SCENARIO)
+    if filename is not None:
+        with open(filename, "r") as file:
+            scenario.update(json.load(file))
+    return scenario
+
+
+def make_simulation(scenario):
+    """
+    :return: The Simulation, the names of the bodies and the radius to draw each body.
+    """
+
+    if scenario["bodies"] == "solar system":
+        simulation, radii = solar_system(scenario["integrator"])
+        names = SOLAR_SYSTEM_NAMES
+        simulation.softening = scenario["softening"]
+    else:
+        simulation = Simulation.from_bodies(scenario["bodies"], scenario["softening"], scenario["integrator"])
+        names = [f"body {i}" for i in range(len(simulation))]
+        radii = np.full(len(simulation), 0.05)
+
+    simulation.solver = scenario["solver"]
+    simulation.theta = scenario["theta"]
+    names = scenario["names"] or names
+    radii = scenario["radii"] if scenario["radii"] is not None else radii
+    return simulation, list(names), [float(radius) for radius in radii]
+
+
+def run(scenario, filename, resume=False, report_period=5):
+    """
+    Runs a scenario and saves the positions to a .traj file, saving a checkpoint after each chunk.
+    :param scenario: The scenario from load_scenario.
+    :param filename: The path to the .traj file.
+    :param resume: If the run should carry on from the last checkpoint.
+    :return: The Simulation at the end of the run.
+    """
+
+    simulation, names, radii = make_simulation(scenario)
+    header = {
+        "bodies": len(simulation), "names": names, "radii": radii, "masses": simulation.masses.tolist(),
+        **{key: scenario[key] for key in ("integrator", "solver", "theta", "softening", "dt", "record_every", "scale")}
+    }
+
+    # a checkpoint is only used by a run of the same scenario that wrote the same .traj header
+    description = {
+        "scenario": {key: value for key, value in scenario.items() if key not in RESUMABLE_KEYS},
+        "header": header
+    }
+
+    steps = 0
+    if resume and os.path.exists(trajectory.checkpoint_path(filename)):
+        if {**header, "version": trajectory.VERSION} != trajectory.load_header(filename):
+            raise ValueError(f"{filename} was written by a different scenario.")
+        offset, steps = trajectory.load_checkpoint(filename, simulation, description)
+        writer = trajectory.TrajectoryWriter(filename, header, offset)
+    else:
+        writer = trajectory.TrajectoryWriter(filename, header)
+
+    # chunks of frames are collected in arrays before they are written
+    chunk_frames = scenario["chunk_frames"]
+    times = np.empty(chunk_frames)
+    positions = np.empty((chunk_frames, len(simulation), 2))
+    frames = 0
+    if steps == 0:
+        times[0], positions[0] = simulation.time, simulation.positions
+        frames = 1
+
+    end_time = scenario["duration"]
+    start = last_report = time.perf_counter()
+    start_steps = steps
+    try:
+        while simulation.time < end_time:
+            simulation.step(min(scenario["dt"], end_time - simulation.time))
+            steps += 1
+
+            if steps % scenario["record_every"] == 0 or simulation.time >= end_time:
+                times[frames], positions[frames] = simulation.time, simulation.positions
+                frames += 1
+
+            if frames == chunk_frames or (simulation.time >= end_time and frames):
+                offset = writer.write_chunk(times[:frames], positions[:frames])
+                trajectory.save_checkpoint(filename, simulation, offset, steps, description)
+                frames = 0
+
+            now = time.perf_counter()
+            if now - last_report > report_period:
+                print(f"{simulation.time / end_time:.1%} done, {(steps - start_steps) / (now - start):.0f} steps/s")
+                last_report = now
+    finally:
+        writer.close()
+
+    print(f"Finished {steps} steps in {time.perf_counter() - start:.1f} seconds")
+    return simulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the gravity simulation without a window.")
+    parser.add_argument("output", help="the .traj file to save the paths to")
+    parser.add_argument("scenario", nargs="?", help="the JSON scenario file, the solar system for a year if missing")
+    parser.add_argument("--resume", action="store_true", help="carry on from the last checkpoint")
+    arguments = parser.parse_args()
+
+    try:
+        run(load_scenario(arguments.scenario), arguments.output, arguments.resume)
+    except ValueError as error:
+        sys.exit(f"Couldn't run the simulation: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import numpy as np
+import integrating_functions as integrating
+import tree_functions as tree
+
+
+"""
+This is the file for simulating bodies moving under gravity.
+
+The positions, velocities and masses of every body are held in numpy arrays,
+positions and velocities have a row of (x, y) for each body.
+The acceleration of every body is worked out at once from the distances between every pair of bodies,
+so any number of bodies can be simulated.
+
+To add bodies to a simulation put them in the arrays passed to Simulation,
+or add them to the list in solar_system.
+The way the simulation is moved forward in time is chosen from integrating_functions.py.
+
+The accelerations are worked out by a solver from solver_dict. Solvers accept the arguments:
+   positions, masses, softening, theta
+and return the (x, y) acceleration of each body. theta is only used by approximate solvers,
+higher values are faster and less accurate.
+"""
+
+
+G = 6.67e-11
+
+# bodies are split into blocks of rows so the arrays of pairs fit in the processor's cache
+BLOCK_SIZE = 128
+# with this many bodies or fewer most of the time is spent starting numpy operations, so fewer are used
+SMALL_COUNT = 16
+
+
+def pair_differences(positions, start, stop):
+    """
+    :return: The x and y distances from each body in positions[start:stop] to every body,
+        and the square of the distance.
+    """
+
+    x, y = positions[:, 0], positions[:, 1]
+    dx = x[np.newaxis, :] - x[start:stop, np.newaxis]
+    dy = y[np.newaxis, :] - y[start:stop, np.newaxis]
+    distance_squared = dx * dx
+    distance_squared += dy * dy
+    return dx, dy, distance_squared
+
+
+def small_accelerations(positions, masses, softening=0.0):
+    """
+    direct_accelerations for a few bodies, with every pair worked out in one array without blocks.
+    """
+
+    differences = positions[np.newaxis, :, :] - positions[:, np.newaxis, :]
+    distance_squared = np.einsum("ijk,ijk->ij", differences, differences)
+    distance_squared += softening ** 2
+    np.fill_diagonal(distance_squared, np.inf)
+
+    strength = np.sqrt(distance_squared)
+    strength *= distance_squared
+    np.divide(masses, strength, out=strength)
+    return G * np.einsum("ij,ijk->ik", strength, differences)
+
+
+def direct_accelerations(positions, masses, softening=0.0, theta=None):
+    """
+    Calculates the acceleration of each body from the pull of every other body.
+    The time taken grows with the square of the number of bodies.
+    :param positions: Array of the (x, y) position of each body.
+    :param masses: Array of the mass of each body.
+    :param softening: A length added to the distances so bodies that pass very close don't fly apart.
+    :return: Array of the (x, y) acceleration of each body.
+    """
+
+    if len(positions) <= SMALL_COUNT:
+        return small_accelerations(positions, masses, softening)
+
+    result = np.empty_like(positions)
+    for start in range(0, len(positions), BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, len(positions))
+        dx, dy, distance_squared = pair_differences(positions, start, stop)
+        distance_squared += softening ** 2
+
+        # a body doesn't pull on itself
+        rows = np.arange(stop - start)
+        distance_squared[rows, rows + start] = np.inf
+
+        # G m / r^3, worked out in place to avoid making more arrays
+        strength = np.sqrt(distance_squared)
+        strength *= distance_squared
+        np.divide(masses, strength, out=strength)
+
+        result[start:stop, 0] = np.einsum("ij,ij->i", strength, dx)
+        result[start:stop, 1] = np.einsum("ij,ij->i", strength, dy)
+    return G * result
+
+
+def barnes_hut_accelerations(positions, masses, softening=0.0, theta=0.5):
+    """
+    Approximates the acceleration of each body by treating groups of far away bodies as one body,
+    see tree_functions.py. The time taken grows with the number of bodies times its logarithm.
+    """
+
+    return G * tree.QuadTree(positions, masses).accelerations(theta, softening)
+
+
+solver_dict = {
+    "Direct": direct_accelerations,
+    "Barnes-Hut": barnes_hut_accelerations
+}
+
+
+class Simulation:
+    """
+    The state of a group of bodies moving under gravity.
+    """
+
+    def __init__(self, positions, velocities, masses, softening=0.0, integrator="Symplectic Euler",
+                 solver="Direct", theta=0.5):
+        self.positions = np.array(positions, dtype=np.float64).reshape(-1, 2)
+        self.velocities = np.array(velocities, dtype=np.float64).reshape(-1, 2)
+        self.masses = np.array(masses, dtype=np.float64)
+        self.softening = softening
+        self.integrator = integrator
+        self.solver = solver
+        self.theta = theta
+        self.time = 0.0
+        # the number of integrator steps taken, adaptive integrators can take several each time step is called
+        self.steps = 0
+
+        # the step adaptive integrators will try next
+        self.suggested_step = None
+        self.last_positions = None
+        self.last_accelerations = None
+
+    @classmethod
+    def from_bodies(cls, bodies, softening=0.0, integrator="Symplectic Euler", solver="Direct", theta=0.5):
+        """
+        :param bodies: A list of [x, y, x velocity, y velocity, mass] for each body.
+        """
+
+        bodies = np.array(bodies, dtype=np.float64).reshape(-1, 5)
+        return cls(bodies[:, :2], bodies[:, 2:4], bodies[:, 4], softening, integrator, solver, theta)
+
+    def __len__(self):
+        return len(self.masses)
+
+    def accelerations(self, positions=None):
+        """
+        :param positions: The positions of the bodies, the current positions if None.
+        :return: The acceleration of each body.
+        """
+
+        if positions is None:
+            positions = self.positions
+        # integrators often need the accelerations at the end of one step at the start of the next
+        if self.last_positions is None or not np.array_equal(positions, self.last_positions):
+            self.last_positions = positions.copy()
+            self.last_accelerations = solver_dict[self.solver](positions, self.masses, self.softening, self.theta)
+        return self.last_accelerations
+
+    def step(self, dt):
+        """
+        Moves the simulation forward with the chosen integrator.
+        :param dt: The time step in seconds.
+        :return: The time step taken, which can be shorter for adaptive integrators.
+        """
+
+        dt = integrating.integrator_dict[self.integrator](self, dt)
+        self.time += dt
+        return dt
+
+    def time_step(self, distance, accuracy_multiplier, max_step):
+        """
+        Chooses a time step that gets shorter as the fastest body speeds up.
+        :param distance: The length scale of the simulation.
+        :param accuracy_multiplier: Higher values give shorter, more accurate steps.
+        :param max_step: The longest time step allowed.
+        :return: The time step in seconds.
+        """
+
+        highest_velocity = np.sqrt(np.einsum("ij,ij->i", self.velocities, self.velocities).max())
+        if highest_velocity == 0:
+            return max_step
+        return min(distance / (highest_velocity ** 1.5 * accuracy_multiplier), max_step)
+
+    def kinetic_energy(self):
+        return 0.5 * np.sum(self.masses * np.einsum("ij,ij->i", self.velocities, self.velocities))
+
+    def potential_energy(self):
+        energy = 0.0
+        for start in range(0, len(self), BLOCK_SIZE):
+            stop = min(start + BLOCK_SIZE, len(self))
+            _, _, distance_squared = pair_differences(self.positions, start, stop)
+            distance = np.sqrt(distance_squared + self.softening ** 2)
+            # only count each pair once
+            pairs = np.arange(len(self))[np.newaxis, :] > np.arange(start, stop)[:, np.newaxis]
+            mass_products = self.masses[start:stop, np.newaxis] * self.masses
+            energy -= G * np.sum(mass_products[pairs] / distance[pairs])
+        return energy
+
+    def energy(self):
+        """
+        :return: The total kinetic and gravitational potential energy, which should stay constant.
+        """
+
+        return self.kinetic_energy() + self.potential_energy()
+
+
+AU = 1.4786e11
+SOLAR_SYSTEM_NAMES = ["sun", "mercury", "venus", "earth", "mars"]
+
+
+def solar_system(integrator="Symplectic Euler"):
+    """
+    :param integrator: The name of the integrator in integrator_dict.
+    :return: The sun and the inner planets, and the radius to draw each one relative to AU.
+    """
+
+    bodies = [
+        [0, 0, 0, 0, 1.989e30],  # sun
+        [0, -4.6e10, -5.898e4, 0, 3.3010e23],  # mercury
+        [-0.71843 * AU, 0, 0, 3.526e4, 4.8675e24],  # venus
+        [0, 1.47098074e11, 3.029e4, 0, 5.972e24],  # earth
+        [1.3814 * AU, 0, 0, -2.65e4, 6.39e23]  # mars
+    ]
+    radii = np.array([0.1, 0.05, 0.05, 0.05, 0.05])
+    return Simulation.from_bodies(bodies, integrator=integrator), radii
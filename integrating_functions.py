@@ -0,0 +1,153 @@
+import time
+import numpy as np
+
+
+"""
+This is the file for the ways the gravity simulation can be moved forward in time.
+
+The functions need to accept the arguments:
+   simulation, dt
+
+simulation is a Simulation from gravity_functions.py, the function must update
+simulation.positions and simulation.velocities. Use simulation.accelerations(positions)
+to get the acceleration of each body when they are at the given positions,
+the accelerations at the last positions used are remembered so using them again is free.
+
+dt is the time step in seconds. Adaptive integrators can cover dt with as many steps of their own as they need.
+
+The functions must add the number of steps they took to simulation.steps and return the time they moved forward.
+
+After writing a function that fits these requirements add it to integrator_dict in the form:
+   name: function
+"""
+
+
+def symplectic_euler(simulation, dt):
+    # change the velocities then move the bodies, first order accurate but keeps orbits stable
+    simulation.velocities += simulation.accelerations() * dt
+    simulation.positions += simulation.velocities * dt
+    simulation.steps += 1
+    return dt
+
+
+def leapfrog(simulation, dt):
+    # velocity Verlet, second order accurate and keeps the energy stable over long runs
+    simulation.velocities += simulation.accelerations() * (dt / 2)
+    simulation.positions += simulation.velocities * dt
+    simulation.velocities += simulation.accelerations() * (dt / 2)
+    simulation.steps += 1
+    return dt
+
+
+def runge_kutta_4(simulation, dt):
+    x, v = simulation.positions, simulation.velocities
+
+    a1 = simulation.accelerations(x)
+    v2 = v + a1 * (dt / 2)
+    a2 = simulation.accelerations(x + v * (dt / 2))
+    v3 = v + a2 * (dt / 2)
+    a3 = simulation.accelerations(x + v2 * (dt / 2))
+    v4 = v + a3 * dt
+    a4 = simulation.accelerations(x + v3 * dt)
+
+    simulation.positions = x + (v + 2 * v2 + 2 * v3 + v4) * (dt / 6)
+    simulation.velocities = v + (a1 + 2 * a2 + 2 * a3 + a4) * (dt / 6)
+    simulation.steps += 1
+    return dt
+
+
+# Dormand-Prince coefficients
+DP_NODES = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84]
+]
+DP_ERROR = [71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40]
+
+TOLERANCE = 1e-9
+
+
+def error_size(error, values):
+    """
+    :return: The size of the error compared to the tolerance for the size of the values.
+    """
+
+    scale = TOLERANCE * max(np.abs(values).max(), np.finfo(np.float64).tiny)
+    return np.abs(error).max() / scale
+
+
+def dormand_prince(simulation, dt):
+    """
+    Adaptive fifth order Runge-Kutta steps with a fourth order error estimate, taken until dt has passed.
+    Each step is shortened until the error is within TOLERANCE of the size of the positions and velocities,
+    and the next step is lengthened if the error was small, up to the rest of dt.
+    """
+
+    remaining = dt
+    while remaining > 0:
+        step = remaining if simulation.suggested_step is None else simulation.suggested_step
+        # the last step is cut short to finish at the end of dt
+        last_step = step >= remaining
+        step = min(step, remaining)
+        x, v = simulation.positions, simulation.velocities
+
+        while True:
+            x_rates, v_rates = [v], [simulation.accelerations(x)]
+            for weights in DP_NODES[1:]:
+                x_stage = x + step * sum(weight * rate for weight, rate in zip(weights, x_rates))
+                v_stage = v + step * sum(weight * rate for weight, rate in zip(weights, v_rates))
+                x_rates.append(v_stage)
+                v_rates.append(simulation.accelerations(x_stage))
+
+            # the last stage is the new state, its accelerations are remembered by the simulation for the next step
+            x_error = step * sum(weight * rate for weight, rate in zip(DP_ERROR, x_rates))
+            v_error = step * sum(weight * rate for weight, rate in zip(DP_ERROR, v_rates))
+            error = max(error_size(x_error, x_stage), error_size(v_error, v_stage), 1e-10)
+
+            factor = min(max(0.9 * error ** -0.2, 0.2), 5)
+            if error <= 1:
+                break
+            step *= factor
+            last_step = False
+
+        simulation.positions, simulation.velocities = x_stage, v_stage
+        simulation.steps += 1
+        # a step cut short to finish dt doesn't show how long the next step can be
+        if not last_step or simulation.suggested_step is None or step * factor < simulation.suggested_step:
+            simulation.suggested_step = step * factor
+        remaining = 0 if last_step else remaining - step
+    return dt
+
+
+integrator_dict = {
+    "Symplectic Euler": symplectic_euler,
+    "Leapfrog": leapfrog,
+    "Runge-Kutta 4": runge_kutta_4,
+    "Dormand-Prince": dormand_prince
+}
+
+
+def measure(simulation, duration, max_step):
+    """
+    Runs a simulation for a length of simulated time and reports how fast and accurate it was.
+    :param duration: The simulated time to run for in seconds.
+    :param max_step: The longest time step allowed, adaptive integrators take steps of their own up to this time.
+    :return: The number of steps taken, steps per second and the fraction the total energy changed by.
+    """
+
+    start_energy = simulation.energy()
+    end_time = simulation.time + duration
+    start_steps = simulation.steps
+
+    start = time.perf_counter()
+    while simulation.time < end_time:
+        simulation.step(min(max_step, end_time - simulation.time))
+    elapsed = time.perf_counter() - start
+    steps = simulation.steps - start_steps
+
+    drift = abs((simulation.energy() - start_energy) / start_energy)
+    return steps, steps / max(elapsed, 1e-9), drift
@@ -1,16 +1,15 @@
-import numpy as np
-
-
 """
 This is the file for editing which models you can plot with their equations.
 
 To add a model you need to write:
  - A function to create the label
- - A function for generating the points to plot
+ - A function of the form f(x, *inputs) that returns the y value for an array of x values
  - A function to validate the users inputs (you can uses any_numbers if there are no requirements)
- 
+
 You then need do add the functions to models_dict in the following format:
-   "equation": [points_function, label_function, validation_function, [inputs]]
+   "equation": [model_function, label_function, validation_function, [inputs]]
+
+The points the model is drawn at are chosen in sampling_functions.py, more points are used where the curve bends.
 """
 
 
@@ -18,20 +17,16 @@ def any_numbers(*_):
     return True
 
 
-def linear(m, c, min_val, max_val):
-    x = np.linspace(min_val, max_val, 2000)
-    y = m * x + c
-    return x, y
+def linear(x, m, c):
+    return m * x + c
 
 
 def linear_label(m, c):
     return f"y = {m}x + {c}"
 
 
-def extended_exponential(a, r, c, min_val, max_val):
-    x = np.linspace(min_val, max_val, 2000)
-    y = a * (r ** x) + c
-    return x, y
+def extended_exponential(x, a, r, c):
+    return a * (r ** x) + c
 
 
 def extended_exponential_label(a, r, c):
@@ -44,10 +39,8 @@ def check_extended_exponential(a, r, c):
     return True
 
 
-def quadratic(a, b, c, min_val, max_val):
-    x = np.linspace(min_val, max_val, 2000)
-    y = a * x ** 2 + b * x + c
-    return x, y
+def quadratic(x, a, b, c):
+    return a * x ** 2 + b * x + c
 
 
 def quadratic_label(a, b, c):
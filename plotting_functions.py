@@ -1,24 +1,34 @@
-import math
-import statistics
 import numpy as np
-import scipy.stats
 import matplotlib.pyplot as plt
-from functools import reduce
+import data_functions as data_func
+import smoothing_functions as smoothing
+import detail_functions as detail
+from fitting_functions import PolynomialFit
+from cache_functions import cached
 
 
 """
 This is the file for writing new types of graph.
 
 The functions need to accept the arguments:
-   x_data, y_data, show_best_fit, show_rank, colours, label
-   
+   data, show_best_fit, show_rank, colours, label, polar
+
+data is a SectionedData with all the points in data.x and data.y.
+The data is split into sections where there are gaps, data.breaks has the index each new section starts at
+and data.joined() gives the points with nan between the sections so they can be drawn as one line.
+
 The functions should plot the data using plt.plot.
 
 The functions must label the graphs with the supplied label.
 
 The functions must show pearson's rand if it is selected.
 
+show_best_fit is the degree of the polynomial line of best fit, or 0 for no line of best fit.
+If the data has weights in data.weights the line of best fit should use them.
+
 The functions must use the supplied colours but can use a gradient between them if appropriate.
+Set colour_index on each artist drawn in one of the colours to the index of its colour, eg. line.colour_index = 0,
+so the artist is recoloured when the plot's colours are changed.
 
 The functions must return the labels in a list so they can be added to the key.
 
@@ -27,156 +37,221 @@ After writing a function that fits these requirements add it to plotting_dict in
 """
 
 
-def scatter_plot(x, y, show_best_fit, rank, colours, label, polar):
-    x = reduce(lambda a, b: a + b, x)
-    if polar:
-        x = list(map(math.radians, x))
-    y = reduce(lambda a, b: a + b, y)
-    x2 = np.array(x)
-    y2 = np.array(y)
+def rank_text(fit):
+    r, p = fit.pearson()
+    return f"\nr = {r:.4}, p = {p:.4}"
 
-    handles = []
 
-    if rank and len(x) > 1:
-        r, p = scipy.stats.pearsonr(x2, y2)
-        rank_text = f"\nr = {r:.4}, p = {p:.4}"
-    else:
-        rank_text = ""
+def polynomial_label(coefficients):
+    """
+    :param coefficients: The coefficients with the lowest power first.
+    :return: The equation of the polynomial, eg. y = 2x^2 + 3x + 1.
+    """
 
-    if len(x) > 300:
-        line, = plt.plot(x, y, "x", color=colours[0], label=label + rank_text, alpha=.15)
-    elif len(x2) > 50:
-        line, = plt.plot(x, y, "x", color=colours[0], label=label + rank_text, alpha=.7)
+    terms = []
+    for power, coefficient in reversed(list(enumerate(coefficients))):
+        variable = "" if power == 0 else "x" if power == 1 else f"x^{power}"
+        terms.append(f"{coefficient:.5}{variable}")
+    return "y = " + " + ".join(terms)
+
+
+def plot_best_fit(fit, colour, polar, to_radians):
+    """
+    Plots the line of best fit across the range of the data, with a band of one standard error either side.
+    :param fit: The PolynomialFit of the data.
+    :param to_radians: If the x values need converting from degrees before plotting.
+    :return: The best fit line.
+    """
+
+    try:
+        coefficients, _ = fit.coefficients()
+    except ValueError:
+        return None
+
+    # curves and lines around a polar graph need lots of points, straight lines only need enough for the band
+    if polar or fit.degree > 1:
+        points = np.linspace(fit.min, fit.max, 2000)
     else:
-        line, = plt.plot(x, y, "x", color=colours[0], label=label + rank_text)
-    handles.append(line)
+        points = np.linspace(fit.min, fit.max, 50)
+    y_points, uncertainty = fit.evaluate(points)
+    x_points = np.radians(points) if to_radians else points
+
+    band = plt.fill_between(x_points, y_points - uncertainty, y_points + uncertainty, color=colour, alpha=0.2,
+                            linewidth=0)
+    best_fit, = plt.plot(x_points, y_points, label=polynomial_label(coefficients), color=colour)
+    band.colour_index = best_fit.colour_index = 1
+    return best_fit
+
+
+def fit_degree(show_best_fit):
+    # pearson's r without a line of best fit uses a straight line
+    return max(int(show_best_fit), 1)
+
+
+def scatter_fit(data, polar, degree=1):
+    """
+    :return: The PolynomialFit of a scatter, with the angles in radians for polar graphs.
+    """
+
+    x = np.radians(data.x) if polar else data.x
+    return cached("fit", data, polar, degree,
+                  calculate=lambda: PolynomialFit.from_data(x, data.y, degree, data.weights))
+
+
+def line_fit(data, degree=1):
+    return cached("fit", data, False, degree,
+                  calculate=lambda: PolynomialFit.from_data(data.x, data.y, degree, data.weights))
+
+
+def cached_fit(data, plot_name, show_best_fit, rank, polar):
+    """
+    :return: The line of best fit of a plot, or None if the plot doesn't have one calculated from its points.
+    """
 
-    if show_best_fit and len(x) > 1:
-        min_val = None
-        max_val = None
-        for x_val in x2:
-            if min_val is None:
-                min_val = x_val
-            else:
-                min_val = min(min_val, x_val)
-            if max_val is None:
-                max_val = x_val
-            else:
-                max_val = max(max_val, x_val)
-
-        # noinspection PyTupleAssignmentBalance
-        m, c = np.polyfit(x2, y2, 1)
+    if not (show_best_fit or rank) or len(data) < 2:
+        return None
+    if plot_name == "Scatter":
+        return scatter_fit(data, polar, fit_degree(show_best_fit))
+    if plot_name == "Line":
+        return line_fit(data, fit_degree(show_best_fit))
+    return None
 
+
+def update_fit(fit, data, plot_name, show_best_fit, polar, added, removed):
+    """
+    Caches the line of best fit of data that has had points added and removed,
+    only adding and removing those points from the old fit rather than calculating it again.
+    :param fit: The fit from cached_fit before the points changed.
+    :param added: The SectionedData of the points added.
+    :param removed: The SectionedData of the points removed.
+    """
+
+    fit = fit.copy()
+    to_radians = polar and plot_name == "Scatter"
+    for points, change in ((added, fit.add), (removed, fit.remove)):
+        change(np.radians(points.x) if to_radians else points.x, points.y, points.weights)
+    x = np.radians(data.x) if to_radians else data.x
+    if len(removed) and len(data):
+        fit.min, fit.max = float(x.min()), float(x.max())
+    if fit.needs_recentring():
+        fit = PolynomialFit.from_data(x, data.y, fit.degree, data.weights)
+
+    # the same key as scatter_fit and line_fit
+    cached("fit", data, to_radians, fit_degree(show_best_fit), calculate=lambda: fit)
+
+
+def smoothed_data(data, polar, bin_width=None):
+    """
+    :return: The SectionedData of the smoothed line.
+    """
+
+    def calculate():
+        smoothed = smoothing.smooth(data, bin_width)
         if polar:
-            points = np.linspace(min_val, max_val, 2000)
-        else:
-            points = np.array([min_val, max_val])
-        best_fit, = plt.plot(points, m * points + c, label=f"y = {m:.5}x + {c:.5}", color=colours[1])
-        handles.append(best_fit)
+            # extra points so the lines between bins curve around the graph
+            smoothed = smoothing.interpolate(smoothed, 3)
+        return smoothed
+
+    return cached("smoothed", data, bin_width, polar, calculate=calculate)
 
-    return handles
 
+def scatter_plot(data, show_best_fit, rank, colours, label, polar):
+    x2 = data.x
+    if polar:
+        x2 = np.radians(x2)
+    y2 = data.y
 
-def line_plot(x, y, show_best_fit, rank, colours, label, polar):
     handles = []
-    x2 = np.array(reduce(lambda a, b: a + b, x))
-    y2 = np.array(reduce(lambda a, b: a + b, y))
 
-    if rank:
-        r, p = scipy.stats.pearsonr(x2, y2)
-        rank_text = f"\nr = {r:.4}, p = {p:.4}"
-    else:
-        rank_text = ""
+    fit = None
+    if (rank or show_best_fit) and len(x2) > 1:
+        fit = scatter_fit(data, polar, fit_degree(show_best_fit))
 
-    for x_sec, y_sec in zip(x, y):
-        if polar:
-            x_sec = list(map(math.radians, x_sec))
-        line, = plt.plot(x_sec, y_sec, color=colours[0], label=label + rank_text)
+    if rank and fit is not None:
+        label += rank_text(fit)
+
+    # large scatters only draw the points needed to show the data at the current zoom
+    if len(x2) > 300:
+        line = detail.plot_scatter(x2, y2, "x", color=colours[0], label=label, alpha=.15)
+    elif len(x2) > 50:
+        line = detail.plot_scatter(x2, y2, "x", color=colours[0], label=label, alpha=.7)
+    else:
+        line = detail.plot_scatter(x2, y2, "x", color=colours[0], label=label)
+    line.colour_index = 0
     handles.append(line)
 
-    if show_best_fit:
-        min_val = None
-        max_val = None
-        for x_val in x2:
-            if min_val is None:
-                min_val = x_val
-            else:
-                min_val = min(min_val, x_val)
-            if max_val is None:
-                max_val = x_val
-            else:
-                max_val = max(max_val, x_val)
-
-        # noinspection PyTupleAssignmentBalance
-        m, c = np.polyfit(x2, y2, 1)
+    if show_best_fit and fit is not None:
+        best_fit = plot_best_fit(fit, colours[1], polar, False)
+        if best_fit is not None:
+            handles.append(best_fit)
 
-        if polar:
-            points = np.linspace(min_val, max_val, 2000)
-        else:
-            points = np.array([min_val, max_val])
-        best_fit, = plt.plot(list(map(math.radians, points)), m * points + c, label=f"y = {m:.5}x + {c:.5}", color=colours[1])
-        handles.append(best_fit)
     return handles
 
 
-def smoothed_plot(x, y, show_best_fit, show_rank, colours, label, polar):
-    x2 = np.array(reduce(lambda a, b: a + b, x))
-    y2 = np.array(reduce(lambda a, b: a + b, y))
-    vals = list(zip(x2, y2))
-    vals.sort(key=lambda a: a[0])
+def line_plot(data, show_best_fit, rank, colours, label, polar):
+    handles = []
 
-    if len(x2) > 500:
-        x3 = np.linspace(min(x2), max(x2), round((len(x2) ** (2/3)) / 1.6))
-    elif len(x2) > 150:
-        x3 = np.linspace(min(x2), max(x2), round((len(x2) ** (3 / 4)) / 1.6))
-    else:
-        x3 = np.linspace(min(x2), max(x2), math.ceil((len(x2)/1.8)))
-
-    x4 = [[]]
-    y4 = [[]]
-    current = 1
-    y_values = []
-    for x_val, y_val in vals:
-        if x_val <= x3[current]:
-            y_values.append(y_val)
-        else:
-            if y_values:
-                x4[-1].append(statistics.mean((x3[current - 1], x3[current])))
-                y4[-1].append(statistics.fmean(y_values))
-            elif x4[-1]:
-                x4.append([])
-                y4.append([])
-            current += 1
-            y_values = []
-
-    if y_values:
-        x4[-1].append(statistics.mean((x3[current - 1], x3[current])))
-        y4[-1].append(statistics.mean(y_values))
-
-    if not x4[-1]:
-        x4.pop()
-        y4.pop()
+    fit = None
+    if (rank or show_best_fit) and len(data) > 1:
+        fit = line_fit(data, fit_degree(show_best_fit))
 
-    if polar:
-        x5 = []
-        y5 = []
-        for x_sec, y_sec in zip(x4, y4):
-            x5.append([])
-            y5.append([])
-            for i in range(len(x_sec) - 1):
-                x5[-1] += list(np.linspace(x_sec[i], x_sec[i+1], 4))[:-1]
-                y5[-1] += list(np.linspace(y_sec[i], y_sec[i+1], 4))[:-1]
-            x5[-1].append(x_sec[-1])
-            y5[-1].append(y_sec[-1])
-
-        handles = line_plot(x5, y5, show_best_fit, show_rank, colours, label, polar)
+    if rank and fit is not None:
+        label += rank_text(fit)
 
-    else:
-        handles = line_plot(x4, y4, show_best_fit, show_rank, colours, label, polar)
+    # one line with nan between the sections rather than a line per section,
+    # large lines only draw the points needed to show the data at the current zoom
+    line = detail.plot_line(data, polar, color=colours[0], label=label)
+    line.colour_index = 0
+    handles.append(line)
 
+    if show_best_fit and fit is not None:
+        best_fit = plot_best_fit(fit, colours[1], polar, polar)
+        if best_fit is not None:
+            handles.append(best_fit)
     return handles
 
 
+def smoothed_plot(data, show_best_fit, show_rank, colours, label, polar, bin_width=None):
+    smoothed = smoothed_data(data, polar, bin_width)
+    return line_plot(smoothed, show_best_fit, show_rank, colours, label, polar)
+
+
+def prepare_plot(data, plot_name, show_best_fit, rank, polar, bin_width=None):
+    """
+    Calculates the results a plot uses before it is drawn, so they can be worked out in the background.
+    The results are cached so drawing the plot afterwards doesn't calculate them again.
+    Plot types that aren't listed here are calculated when they are drawn.
+    """
+
+    if plot_name == "Smoothed Line":
+        data = smoothed_data(data, polar, bin_width)
+
+    if not (show_best_fit or rank) or len(data) < 2:
+        return
+    if plot_name == "Scatter":
+        scatter_fit(data, polar, fit_degree(show_best_fit))
+    elif plot_name in ("Line", "Smoothed Line"):
+        line_fit(data, fit_degree(show_best_fit))
+
+
+def prepare_line(dataset, settings, polar, progress=None, cancelled=None):
+    """
+    Prepares the points of a plot and the results it uses, this can be run in a background thread.
+    :param dataset: The Dataset to read the columns from.
+    :param settings: The options for the plot, see GraphWindow.plot_settings in graphing.py.
+    :param polar: If the plot is for a polar graph.
+    :return: The SectionedData to plot.
+    """
+
+    data = data_func.prepare_data(
+        dataset, settings["x_name"], settings["y_name"], settings["x_func"], settings["y_func"], settings["scale"],
+        settings["weights_name"], progress, cancelled)
+    if len(data):
+        prepare_plot(
+            data, settings["plot_type"], settings["best_fit"], settings["rank"], polar, settings["bin_width"])
+    return data
+
+
 plotting_dict = {
     "Scatter": scatter_plot,
     "Line": line_plot,
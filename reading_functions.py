@@ -0,0 +1,434 @@
+import bz2
+import csv
+import gzip
+import io
+import lzma
+import os
+from itertools import islice
+import numpy as np
+import trajectory_functions as trajectory
+
+
+"""
+This is the file for the types of file that data can be read from.
+
+A reader is a class that is created with the filename and has:
+   description: The name of the type of file shown when opening a file, eg. "Csv Files".
+   sidecar: If columns read by it should be saved in the cache to open quickly next time.
+   headers(): Returns the list of column names.
+   load_columns(indexes, progress, cancelled): Returns a dict of the index of each requested column
+      to a numpy array of its values as floats and a mask of which values are numeric.
+      progress and cancelled can be None, otherwise call progress with the fraction of the file read
+      and raise LoadCancelled if cancelled() returns True.
+
+To add a reader write the class then register it for the file extensions it reads with:
+   register_reader(".extension", ReaderClass)
+Extensions can contain more than one dot, eg. ".csv.gz", the longest matching extension is used.
+"""
+
+
+CHUNK_SIZE = 65536
+# the number of bytes searched at a time for the end of the last whole line of a file
+LINE_SEARCH_SIZE = 65536
+
+# errors raised by readers for files that can't be read
+READ_ERRORS = (OSError, EOFError, UnicodeDecodeError, ValueError)
+
+
+class LoadCancelled(Exception):
+    """
+    Raised when reading a file is cancelled.
+    """
+
+
+def parse_column(cells):
+    """
+    Converts a list of strings to floats.
+    :param cells: The text of each cell in the column.
+    :return: An array of values and a mask of which values are numeric. Non-numeric values are nan.
+    """
+
+    try:
+        return np.array(cells, dtype=np.float64), np.ones(len(cells), dtype=bool)
+    except ValueError:
+        pass
+
+    values = np.full(len(cells), np.nan)
+    mask = np.zeros(len(cells), dtype=bool)
+    for i, cell in enumerate(cells):
+        try:
+            values[i] = float(cell)
+            mask[i] = True
+        except ValueError:  # If data is not numeric
+            pass
+    return values, mask
+
+
+def numeric_column(array):
+    """
+    Converts an array from a binary file to a column.
+    Float arrays are used without copying, nan values are marked as not numeric.
+    :return: The values and mask of the column.
+    """
+
+    if array.dtype.kind not in "biuf":
+        return parse_column(array.astype(str).tolist())
+    values = array if array.dtype == np.float64 else array.astype(np.float64)
+    return values, ~np.isnan(values)
+
+
+class ColumnBuilder:
+    """
+    Collects a column of values in arrays that grow as chunks of rows are added.
+    """
+
+    def __init__(self, capacity=CHUNK_SIZE):
+        self.values = np.empty(capacity)
+        self.mask = np.empty(capacity, dtype=bool)
+        self.size = 0
+
+    def append(self, values, mask):
+        end = self.size + len(values)
+        if end > len(self.values):
+            # double the size so adding rows takes linear time overall
+            capacity = max(end, 2 * len(self.values))
+            new_values, new_mask = np.empty(capacity), np.empty(capacity, dtype=bool)
+            new_values[:self.size] = self.values[:self.size]
+            new_mask[:self.size] = self.mask[:self.size]
+            self.values, self.mask = new_values, new_mask
+
+        self.values[self.size:end] = values
+        self.mask[self.size:end] = mask
+        self.size = end
+
+    def result(self):
+        """
+        :return: The values and mask trimmed to the number of rows added.
+        """
+
+        if self.size < len(self.values) * 0.75:
+            return self.values[:self.size].copy(), self.mask[:self.size].copy()
+        return self.values[:self.size], self.mask[:self.size]
+
+
+class FileStart(io.RawIOBase):
+    """
+    The start of a binary file up to a size.
+    """
+
+    def __init__(self, file, size):
+        self.file = file
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.file.readinto(memoryview(buffer)[:self.remaining]) or 0
+        self.remaining -= count
+        return count
+
+
+class CsvReader:
+    """
+    Reads csv files a chunk of rows at a time.
+    Only the part of the file that existed when the reader was made is read,
+    so rows added to a file that is still being written can be read later with CsvTail.
+    """
+
+    description = "Csv Files"
+    sidecar = True
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.size = os.path.getsize(filename)
+
+    def open_binary(self, raw_file):
+        """
+        :param raw_file: The file opened in binary mode.
+        :return: A binary file of the csv text, decompressed for compressed files.
+        """
+
+        return raw_file
+
+    def open(self, raw_file):
+        return io.TextIOWrapper(self.open_binary(raw_file), newline="")
+
+    def headers(self):
+        with open(self.filename, "rb") as raw_file, self.open(raw_file) as file:
+            return next(csv.reader(file), [])
+
+    def load_columns(self, indexes, progress=None, cancelled=None):
+        size = max(self.size, 1)
+        builders = {i: ColumnBuilder() for i in indexes}
+
+        with open(self.filename, "rb") as raw_file, self.open(io.BufferedReader(FileStart(raw_file, self.size))) as file:
+            reader = csv.reader(file)
+            next(reader, None)
+
+            while True:
+                if cancelled is not None and cancelled():
+                    raise LoadCancelled
+
+                rows = list(islice(reader, CHUNK_SIZE))
+                if not rows:
+                    break
+                # skip blank rows like csv.DictReader
+                rows = [row for row in rows if row]
+
+                for i, builder in builders.items():
+                    builder.append(*parse_column([row[i] if i < len(row) else "" for row in rows]))
+
+                if progress is not None:
+                    # progress through the file on disk, which is compressed for compressed files
+                    progress(min(raw_file.tell() / size, 1))
+
+        return {i: builder.result() for i, builder in builders.items()}
+
+
+class GzipCsvReader(CsvReader):
+    description = "Gzip Csv Files"
+
+    def open_binary(self, raw_file):
+        return gzip.GzipFile(fileobj=raw_file)
+
+
+class Bz2CsvReader(CsvReader):
+    description = "Bzip2 Csv Files"
+
+    def open_binary(self, raw_file):
+        return bz2.BZ2File(raw_file)
+
+
+class XzCsvReader(CsvReader):
+    description = "Xz Csv Files"
+
+    def open_binary(self, raw_file):
+        return lzma.LZMAFile(raw_file)
+
+
+class CsvTail:
+    """
+    Reads the rows added to the end of a csv file that is still being written.
+    Only whole lines are read, a line that is still being written is read once it is finished.
+    """
+
+    # the most bytes read at once, so a large amount of new rows is read over several calls
+    max_read = 16 * 1024 * 1024
+
+    def __init__(self, filename, indexes, offset):
+        """
+        :param filename: The path to the csv file.
+        :param indexes: The indexes of the columns to read.
+        :param offset: The size of the file when it was last read, reading starts after the last line before it.
+        """
+
+        self.filename = filename
+        self.indexes = indexes
+        self.offset = None
+        with open(filename, "rb") as file:
+            # search back from the offset for the end of the last whole line, however long the lines are
+            end = offset
+            while self.offset is None and end > 0:
+                start = max(end - LINE_SEARCH_SIZE, 0)
+                file.seek(start)
+                newline = file.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    self.offset = start + newline + 1
+                end = start
+        if self.offset is None:
+            raise ValueError("The file doesn't have a whole line of headers yet.")
+
+    def read_rows(self):
+        """
+        :return: A dict of the index of each column to the values and mask of the new rows,
+            or None if no whole lines have been added.
+        """
+
+        if os.path.getsize(self.filename) < self.offset:
+            raise ValueError("The file has been shortened or replaced since it was opened.")
+        with open(self.filename, "rb") as file:
+            file.seek(self.offset)
+            text = file.read(self.max_read)
+        end = text.rfind(b"\n") + 1
+        if not end:
+            return None
+        self.offset += end
+
+        # skip blank rows like csv.DictReader
+        rows = [row for row in csv.reader(io.StringIO(text[:end].decode(), newline="")) if row]
+        return {i: parse_column([row[i] if i < len(row) else "" for row in rows]) for i in self.indexes}
+
+
+class NpyReader:
+    """
+    Reads a numpy array saved with numpy.save, memory mapped so columns aren't copied.
+    Arrays with named fields use the field names as headers,
+    2D arrays have a column for each column of the array and 1D arrays are one column.
+    """
+
+    description = "NumPy Arrays"
+    sidecar = False
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.array = np.load(filename, mmap_mode="r")
+        if self.array.dtype.names is None and self.array.ndim not in (1, 2):
+            raise ValueError("Only 1D and 2D arrays can be graphed.")
+
+    def headers(self):
+        if self.array.dtype.names is not None:
+            return list(self.array.dtype.names)
+        if self.array.ndim == 1:
+            return ["values"]
+        return [f"column {i}" for i in range(self.array.shape[1])]
+
+    def load_columns(self, indexes, progress=None, cancelled=None):
+        columns = {}
+        for i in indexes:
+            if self.array.dtype.names is not None:
+                columns[i] = numeric_column(self.array[self.array.dtype.names[i]])
+            elif self.array.ndim == 1:
+                columns[i] = numeric_column(self.array)
+            else:
+                columns[i] = numeric_column(self.array[:, i])
+        return columns
+
+
+class NpzReader:
+    """
+    Reads the arrays saved with numpy.savez, each 1D array is a column.
+    """
+
+    description = "NumPy Archives"
+    sidecar = False
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def headers(self):
+        with np.load(self.filename) as archive:
+            return list(archive.files)
+
+    def load_columns(self, indexes, progress=None, cancelled=None):
+        columns = {}
+        with np.load(self.filename) as archive:
+            for done, i in enumerate(indexes):
+                if cancelled is not None and cancelled():
+                    raise LoadCancelled
+                columns[i] = numeric_column(np.ravel(archive[archive.files[i]]))
+                if progress is not None:
+                    progress((done + 1) / len(indexes))
+        return columns
+
+
+class ParquetReader:
+    """
+    Reads parquet files a column at a time, this needs pyarrow to be installed.
+    """
+
+    description = "Parquet Files"
+    sidecar = False
+
+    def __init__(self, filename):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Reading parquet files needs pyarrow to be installed.")
+        self.filename = filename
+        self.file = pyarrow.parquet.ParquetFile(filename)
+
+    def headers(self):
+        return self.file.schema_arrow.names
+
+    def load_columns(self, indexes, progress=None, cancelled=None):
+        table = self.file.read(columns=[self.headers()[i] for i in indexes])
+        columns = {}
+        for i, column in zip(indexes, table.columns):
+            try:
+                # missing values become nan
+                columns[i] = numeric_column(column.cast("float64").to_numpy(zero_copy_only=False))
+            except (ValueError, NotImplementedError):  # If data is not numeric
+                columns[i] = parse_column([str(cell) for cell in column.to_pylist()])
+        return columns
+
+
+class TrajectoryReader:
+    """
+    Reads the paths saved by gravity_batch.py, with a time column and an x and y column for each body.
+    """
+
+    description = "Trajectories"
+    sidecar = False
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.header = trajectory.load_header(filename)
+
+    def headers(self):
+        names = self.header["names"]
+        return ["time"] + [f"{name} {axis}" for name in names for axis in ("x", "y")]
+
+    def load_columns(self, indexes, progress=None, cancelled=None):
+        builders = {i: ColumnBuilder() for i in indexes}
+        for times, positions, fraction in trajectory.read_chunks(self.filename):
+            if cancelled is not None and cancelled():
+                raise LoadCancelled
+
+            for i, builder in builders.items():
+                # columns after time go x then y for each body
+                values = times if i == 0 else positions[:, (i - 1) // 2, (i - 1) % 2]
+                builder.append(values, np.ones(len(values), dtype=bool))
+
+            if progress is not None:
+                progress(fraction)
+        return {i: builder.result() for i, builder in builders.items()}
+
+
+reader_dict = {}
+
+
+def register_reader(extension, reader):
+    """
+    :param extension: The file extension including the dot, eg. ".csv".
+    :param reader: The reader class.
+    """
+
+    reader_dict[extension.lower()] = reader
+
+
+def get_reader(filename):
+    """
+    :return: The reader class for the file, chosen by the longest matching extension.
+    """
+
+    name = filename.lower()
+    for extension in sorted(reader_dict, key=len, reverse=True):
+        if name.endswith(extension):
+            return reader_dict[extension]
+    raise ValueError(f"There is no reader for {os.path.basename(filename)}.")
+
+
+def file_filter():
+    """
+    :return: The filter for the open file dialog listing every type of file that can be read.
+    """
+
+    descriptions = {}
+    for extension, reader in reader_dict.items():
+        descriptions.setdefault(reader.description, []).append(f"*{extension}")
+
+    all_patterns = " ".join(pattern for patterns in descriptions.values() for pattern in patterns)
+    filters = [f"Data Files ({all_patterns})"]
+    filters += [f"{description} ({' '.join(patterns)})" for description, patterns in descriptions.items()]
+    return ";;".join(filters)
+
+
+register_reader(".csv", CsvReader)
+register_reader(".csv.gz", GzipCsvReader)
+register_reader(".csv.bz2", Bz2CsvReader)
+register_reader(".csv.xz", XzCsvReader)
+register_reader(".npy", NpyReader)
+register_reader(".npz", NpzReader)
+register_reader(".parquet", ParquetReader)
+register_reader(".traj", TrajectoryReader)
@@ -0,0 +1,98 @@
+from functools import lru_cache
+import numpy as np
+from cache_functions import results
+
+
+"""
+This is the file for working out the points a model from model_functions.py is drawn at.
+
+Models are drawn by joining up points with straight lines, so a curve needs more points than a straight line.
+The model is first worked out at COARSE_RESOLUTION points to estimate how much it bends.
+The gap between a straight line and the curve grows with the square of the distance between points,
+so the number of points is raised until the gap is less than TOLERANCE pixels on the screen.
+The gap is measured against the y limits of the graph, as the curve is drawn at the graph's scale.
+On polar graphs even a straight line is a curve around the centre, so the most points are always used.
+There is never more than MAX_POINTS_PER_PIXEL points for each pixel across the graph.
+
+The number of points is rounded up to a power of 2 so the grids of x values can be shared,
+and the points for each model, set of inputs, range and graph size are remembered until something changes.
+"""
+
+
+COARSE_RESOLUTION = 64
+# the most a straight line between points can be away from the curve, in pixels
+TOLERANCE = 0.25
+MAX_POINTS_PER_PIXEL = 2
+
+
+@lru_cache(maxsize=64)
+def sample_grid(min_val, max_val, resolution):
+    """
+    :return: An array of resolution evenly spaced x values from min_val to max_val, which must not be changed.
+    """
+
+    x = np.linspace(min_val, max_val, resolution)
+    x.flags.writeable = False
+    return x
+
+
+def choose_resolution(model, params, x_range, pixel_size, polar=False, y_limits=None):
+    """
+    Chooses how many points to draw a model at, see the top of the file.
+    :param model: The model function from models_dict.
+    :param params: The values of the model's inputs.
+    :param x_range: The range of x values to draw the model across.
+    :param pixel_size: The width and height of the graph in pixels.
+    :param polar: If the graph is polar.
+    :param y_limits: The bottom and top of the graph's y axis, the range of the model if None.
+    :return: The number of points, a power of 2.
+    """
+
+    width, height = pixel_size
+    max_resolution = 1 << int(np.ceil(np.log2(max(width * MAX_POINTS_PER_PIXEL, COARSE_RESOLUTION))))
+    if polar:
+        return max_resolution
+
+    with np.errstate(all="ignore"):
+        y = model(sample_grid(*x_range, COARSE_RESOLUTION), *params)
+    y = y[np.isfinite(y)]
+    if len(y) < 3:
+        return max_resolution
+    # the graph is rescaled to fit the model if it goes outside the limits
+    bottom, top = (y.min(), y.max()) if y_limits is None else (min(y_limits[0], y.min()), max(y_limits[1], y.max()))
+    y_span = top - bottom
+    if not np.isfinite(y_span):
+        return max_resolution
+    if y_span == 0:
+        return COARSE_RESOLUTION
+
+    # the gap between a straight line and the curve is about an eighth of the second difference
+    gap = np.abs(np.diff(y, 2)).max() / 8 * height / y_span
+    needed = COARSE_RESOLUTION * np.sqrt(max(gap / TOLERANCE, 1))
+    return int(min(1 << int(np.ceil(np.log2(needed))), max_resolution))
+
+
+def evaluate(model, params, x_range, pixel_size, polar=False, y_limits=None):
+    """
+    :param model: The model function from models_dict.
+    :param params: The values of the model's inputs.
+    :param x_range: The range of x values to draw the model across.
+    :param pixel_size: The width and height of the graph in pixels.
+    :param polar: If the graph is polar.
+    :param y_limits: The bottom and top of the graph's y axis, the range of the model if None.
+    :return: The x and y values of the points to draw the model at.
+    """
+
+    params = tuple(params)
+    x_range = tuple(float(value) for value in x_range)
+    pixel_size = tuple(int(value) for value in pixel_size)
+    if y_limits is not None:
+        y_limits = tuple(float(value) for value in y_limits)
+
+    def calculate():
+        x = sample_grid(*x_range, choose_resolution(model, params, x_range, pixel_size, polar, y_limits))
+        with np.errstate(all="ignore"):
+            y = model(x, *params)
+        return x, y
+
+    return results.get(("model", model, params, x_range, pixel_size, polar, y_limits), calculate)
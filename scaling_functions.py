@@ -0,0 +1,79 @@
+import numpy as np
+
+
+"""
+This is the file for the ways you can scale the y values of a plot.
+
+To add a scaling write a function that takes a numpy array of y values and returns the scaled array,
+then add it to scaling_dict in the format:
+   "name": function
+
+The functions are given every valid y value of the plot at once.
+If the values can't be spread out, eg. they are all the same, the function should only shift them.
+"""
+
+
+CHUNK_SIZE = 65536
+NO_SCALING = "None"
+
+
+def mean_variance(values, chunk_size=CHUNK_SIZE):
+    """
+    Calculates the mean and sample variance in one pass over the values, a chunk at a time.
+    The chunks are combined with the parallel form of Welford's algorithm,
+    so the result stays accurate when the values are large compared to their spread.
+    :param values: Array of values.
+    :return: The mean and variance.
+    """
+
+    n, mean, m2 = 0, 0.0, 0.0
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        chunk_mean = chunk.mean()
+        chunk_m2 = np.square(chunk - chunk_mean).sum()
+
+        total = n + len(chunk)
+        delta = chunk_mean - mean
+        mean += delta * len(chunk) / total
+        m2 += chunk_m2 + delta ** 2 * n * len(chunk) / total
+        n = total
+
+    if n < 2:
+        return mean, 0.0
+    return mean, m2 / (n - 1)
+
+
+def shift_and_divide(values, centre, spread):
+    if spread > 0:
+        return (values - centre) / spread
+    return values - centre
+
+
+def no_scaling(values):
+    return values
+
+
+def standard_score(values):
+    # mean is 0 and 1 is one standard deviation
+    mean, variance = mean_variance(values)
+    return shift_and_divide(values, mean, np.sqrt(variance))
+
+
+def min_max(values):
+    # from 0 at the minimum to 1 at the maximum
+    low = values.min()
+    return shift_and_divide(values, low, values.max() - low)
+
+
+def robust(values):
+    # median is 0 and 1 is the interquartile range, so outliers don't change the scaling
+    lower, median, upper = np.percentile(values, [25, 50, 75])
+    return shift_and_divide(values, median, upper - lower)
+
+
+scaling_dict = {
+    NO_SCALING: no_scaling,
+    "Standard score": standard_score,
+    "Min-max": min_max,
+    "Median/IQR": robust
+}
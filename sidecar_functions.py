@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+
+
+"""
+This is the file for saving columns that have been read from a csv file so they open quickly next time.
+
+Each column is saved as a .npy file of values and a .npy file of which values are numeric,
+in a folder for the csv file in the user's cache folder, so nothing is added next to the csv file.
+The folder has a metadata file with the size and modification time of the csv file the columns were read from,
+so the saved columns are ignored once the csv file changes.
+Saved columns are memory mapped, so opening them doesn't copy them into memory.
+
+Set ENABLED to False to stop columns being saved. If the cache folder can't be written the columns just aren't saved.
+The cache folder can be deleted at any time.
+"""
+
+
+ENABLED = True
+VERSION = 1
+METADATA_NAME = "metadata.json"
+
+# a lock for each sidecar folder, so columns of the same file saved at once can't mix their files and metadata
+folder_locks = {}
+folder_locks_lock = threading.Lock()
+
+
+def cache_folder():
+    """
+    :return: The folder the columns of every csv file are saved in.
+    """
+
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        base = os.environ["LOCALAPPDATA"]
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "bpho-graphing", "columns")
+
+
+def sidecar_folder(filename):
+    # the name of the file is kept so the folders can be told apart, the hash separates files with the same name
+    path = os.path.abspath(filename)
+    digest = hashlib.blake2b(path.encode(), digest_size=8).hexdigest()
+    return os.path.join(cache_folder(), f"{os.path.basename(path)}.{digest}")
+
+
+def folder_lock(filename):
+    folder = sidecar_folder(filename)
+    with folder_locks_lock:
+        return folder_locks.setdefault(folder, threading.Lock())
+
+
+def column_paths(filename, index):
+    folder = sidecar_folder(filename)
+    return os.path.join(folder, f"{index}.values.npy"), os.path.join(folder, f"{index}.mask.npy")
+
+
+def read_metadata(filename, mtime, size):
+    """
+    :param filename: The path to the csv file.
+    :param mtime: The modification time of the csv file in nanoseconds.
+    :param size: The size of the csv file in bytes.
+    :return: The metadata of the saved columns, or None if there aren't any for this version of the file.
+    """
+
+    try:
+        with open(os.path.join(sidecar_folder(filename), METADATA_NAME), "r") as file:
+            metadata = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if (metadata.get("version"), metadata.get("mtime"), metadata.get("size")) != (VERSION, mtime, size):
+        return None
+    return metadata
+
+
+def load_column(filename, mtime, size, index):
+    """
+    Opens a saved column.
+    :param index: The index of the column in the csv file.
+    :return: The memory mapped values and mask, or None if the column isn't saved.
+    """
+
+    if not ENABLED:
+        return None
+
+    with folder_lock(filename):
+        metadata = read_metadata(filename, mtime, size)
+        if metadata is None or index not in metadata["columns"]:
+            return None
+
+        values_path, mask_path = column_paths(filename, index)
+        try:
+            return np.load(values_path, mmap_mode="r"), np.load(mask_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+
+def write_atomically(path, write, mode="wb"):
+    """
+    Writes a file by writing a temporary file then renaming it, so a half written file is never read.
+    :param write: A function that writes to the open file.
+    """
+
+    # a unique name so files written at once by different threads or programs don't share a temporary file
+    file = tempfile.NamedTemporaryFile(mode, dir=os.path.dirname(path), suffix=".tmp", delete=False)
+    temporary_path = file.name
+    try:
+        with file:
+            write(file)
+        os.replace(temporary_path, path)
+    except Exception:
+        # don't leave a half written file behind
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_column(filename, mtime, size, index, values, mask):
+    """
+    Saves a column read from a csv file.
+    :param mtime: The modification time of the csv file when the column was read.
+    :param size: The size of the csv file when the column was read.
+    :param index: The index of the column in the csv file.
+    """
+
+    if not ENABLED:
+        return
+
+    with folder_lock(filename):
+        metadata = read_metadata(filename, mtime, size)
+        metadata_path = os.path.join(sidecar_folder(filename), METADATA_NAME)
+        values_path, mask_path = column_paths(filename, index)
+        try:
+            if metadata is None:
+                # the saved columns are from another version of the file,
+                # they are forgotten before any are replaced so they are never mixed with the new columns
+                metadata = {"version": VERSION, "mtime": mtime, "size": size, "columns": []}
+                if os.path.exists(metadata_path):
+                    os.remove(metadata_path)
+
+            os.makedirs(sidecar_folder(filename), exist_ok=True)
+            write_atomically(values_path, lambda file: np.save(file, values))
+            write_atomically(mask_path, lambda file: np.save(file, mask))
+
+            if index not in metadata["columns"]:
+                metadata["columns"].append(index)
+            write_atomically(metadata_path, lambda file: json.dump(metadata, file), "w")
+        except (OSError, ValueError):
+            pass
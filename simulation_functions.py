@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+
+"""
+This is the file for running a simulation in the background while it is drawn.
+
+The physics runs in its own thread and puts a snapshot of the positions into a ring buffer after every step.
+The window takes the newest snapshot whenever it draws a frame,
+so how fast the simulation runs and how often the window is drawn don't depend on each other.
+The buffer is a fixed size, when it is full the oldest snapshots are overwritten.
+"""
+
+
+class SnapshotBuffer:
+    """
+    A ring buffer of the positions of the bodies at different times.
+    """
+
+    def __init__(self, capacity, body_count):
+        self.positions = np.empty((capacity, body_count, 2))
+        self.times = np.empty(capacity)
+        self.lock = threading.Lock()
+
+        # the total number of snapshots pushed and read
+        self.pushed = 0
+        self.read = 0
+
+    def push(self, positions, simulation_time):
+        with self.lock:
+            slot = self.pushed % len(self.times)
+            self.positions[slot] = positions
+            self.times[slot] = simulation_time
+            self.pushed += 1
+
+    def latest(self):
+        """
+        :return: A copy of the newest positions and the simulation time they are from,
+            or None if there are no new snapshots since the last one read.
+        """
+
+        with self.lock:
+            if self.pushed == self.read:
+                return None
+            self.read = self.pushed
+            slot = (self.pushed - 1) % len(self.times)
+            return self.positions[slot].copy(), self.times[slot]
+
+
+class RateCounter:
+    """
+    Measures how many times something happens each second over the last few seconds.
+    It can be ticked in one thread and read in another.
+    """
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self.times = deque()
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def tick(self, count=1):
+        now = time.perf_counter()
+        with self.lock:
+            self.times.append((now, count))
+            self.total += count
+            while self.times and self.times[0][0] < now - self.window:
+                self.times.popleft()
+
+    def rate(self):
+        with self.lock:
+            if len(self.times) < 2:
+                return 0.0
+            elapsed = self.times[-1][0] - self.times[0][0]
+            return sum(count for _, count in list(self.times)[1:]) / max(elapsed, 1e-9)
+
+
+class PhysicsWorker(threading.Thread):
+    """
+    Steps a simulation in the background, keeping the simulation time in step with the real time.
+    """
+
+    def __init__(self, simulation, buffer, speed, time_step):
+        """
+        :param simulation: The Simulation to run.
+        :param buffer: The SnapshotBuffer to put the positions in.
+        :param speed: The number of simulated seconds for each real second.
+        :param time_step: A function that returns the next time step for the simulation.
+        """
+
+        super().__init__(daemon=True)
+        self.simulation = simulation
+        self.buffer = buffer
+        self.speed = speed
+        self.time_step = time_step
+
+        self.steps = RateCounter()
+        # how many simulated seconds the simulation is behind real time when it can't keep up
+        self.behind = 0.0
+        self.stopped = threading.Event()
+
+    def run(self):
+        start = time.perf_counter()
+        start_time = self.simulation.time
+        while not self.stopped.is_set():
+            target_time = start_time + (time.perf_counter() - start) * self.speed
+            self.behind = max(target_time - self.simulation.time, 0.0)
+            if self.simulation.time >= target_time:
+                # ahead of real time, let other threads run
+                time.sleep(0.001)
+                continue
+
+            self.simulation.step(self.time_step())
+            self.buffer.push(self.simulation.positions, self.simulation.time)
+            self.steps.tick()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
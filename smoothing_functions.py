@@ -0,0 +1,116 @@
+import math
+import numpy as np
+from data_functions import SectionedData
+
+
+"""
+This is the file for smoothing data by splitting it into bins along the x-axis and averaging each bin.
+
+Every point is put in a bin with one search of the bin edges and the bins are totalled with np.bincount,
+so no sorting or loops over the points are needed.
+"""
+
+
+MAX_BINS = 1_000_000
+
+
+def automatic_edge_count(n):
+    """
+    :param n: The number of points being smoothed.
+    :return: The number of bin edges to use, with fewer points in each bin for small datasets.
+    """
+
+    if n > 500:
+        count = round((n ** (2 / 3)) / 1.6)
+    elif n > 150:
+        count = round((n ** (3 / 4)) / 1.6)
+    else:
+        count = math.ceil(n / 1.8)
+    return max(count, 2)
+
+
+def bin_edges(x_min, x_max, n, width=None):
+    """
+    :param x_min: The smallest x value.
+    :param x_max: The largest x value.
+    :param n: The number of points being smoothed.
+    :param width: The width of each bin, if not given the number of bins is chosen from the number of points.
+    :return: An array of bin edges covering x_min to x_max.
+    """
+
+    if not width:
+        return np.linspace(x_min, x_max, automatic_edge_count(n))
+
+    # too narrow bins are widened to stop the number of bins getting too large
+    count = min(math.ceil((x_max - x_min) / width), MAX_BINS)
+    if count < 1:
+        return np.array([x_min, x_max])
+    return x_min + np.arange(count + 1) * max(width, (x_max - x_min) / count)
+
+
+def bin_means(x, y, edges):
+    """
+    Averages the y values in each bin.
+    A point on the edge between two bins goes in the lower bin.
+    :param x: Array of x values.
+    :param y: Array of y values.
+    :param edges: Increasing array of bin edges.
+    :return: The centre of each bin, the mean of each bin (nan if the bin is empty) and the number of points in each bin.
+    """
+
+    bin_count = len(edges) - 1
+    step = (edges[-1] - edges[0]) / bin_count
+    if step > 0 and np.allclose(np.diff(edges), step):
+        # evenly spaced bins can be found without searching
+        index = np.ceil((x - edges[0]) / step).astype(np.intp)
+    else:
+        index = np.searchsorted(edges, x, side="left")
+    index = np.clip(index, 1, bin_count) - 1
+
+    counts = np.bincount(index, minlength=bin_count)
+    totals = np.bincount(index, weights=y, minlength=bin_count)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = totals / counts
+    centres = (edges[:-1] + edges[1:]) / 2
+    return centres, means, counts
+
+
+def smooth(data, width=None):
+    """
+    Smooths data by averaging bins, with empty bins creating gaps in the line.
+    :param data: The SectionedData to smooth.
+    :param width: The width of each bin, chooses the number of bins automatically if not given.
+    :return: A SectionedData of the bin centres and means.
+    """
+
+    edges = bin_edges(data.x.min(), data.x.max(), len(data), width)
+    centres, means, counts = bin_means(data.x, data.y, edges)
+    return SectionedData.from_mask(centres, means, counts > 0)
+
+
+def interpolate(data, steps):
+    """
+    Adds evenly spaced points between each pair of points in a section, eg. to make straight lines curve on polar graphs.
+    :param data: The SectionedData to add points to.
+    :param steps: The number of steps to split each gap between points into.
+    :return: A SectionedData with the extra points.
+    """
+
+    n = len(data)
+    if not n:
+        return data
+
+    # the last point in each section isn't joined to the next point
+    section_ends = np.append(data.breaks, n) - 1
+    joined = np.ones(n, dtype=bool)
+    joined[section_ends] = False
+
+    positions = (np.flatnonzero(joined)[:, None] + np.arange(steps) / steps).ravel()
+    positions = np.sort(np.concatenate((positions, section_ends)))
+
+    indices = np.arange(n)
+    return SectionedData(
+        np.interp(positions, indices, data.x),
+        np.interp(positions, indices, data.y),
+        np.searchsorted(positions, data.breaks))
@@ -0,0 +1,157 @@
+import json
+import os
+import struct
+import numpy as np
+
+
+"""
+This is the file for saving the paths of the bodies in a simulation to a .traj file.
+
+A .traj file starts with a JSON header describing the simulation, eg. the number of bodies, their masses and names.
+The header is followed by chunks of frames, each chunk is:
+   the number of frames as a 4 byte unsigned integer
+   the simulation time of each frame as 8 byte floats
+   the (x, y) position of each body in each frame as 4 byte floats
+Chunks are only ever added to the end of the file, so a file that is still being written can be read.
+
+The state of the simulation is saved to a checkpoint file next to the .traj file after each chunk,
+so a run that is stopped can carry on from the last chunk.
+The checkpoint keeps a description of the run, eg. its scenario, and a run only carries on from a checkpoint
+with the same description so a checkpoint left by a different run can't overwrite the wrong file.
+"""
+
+
+MAGIC = b"GRAVTRAJ"
+VERSION = 1
+TIME_TYPE = np.dtype("<f8")
+POSITION_TYPE = np.dtype("<f4")
+
+
+def read_header(file):
+    """
+    :param file: A .traj file opened in binary mode at the start.
+    :return: The header, the file is left at the first chunk.
+    """
+
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("The file isn't a trajectory file.")
+    length, = struct.unpack("<I", file.read(4))
+    header = json.loads(file.read(length).decode())
+    if header.get("version") != VERSION:
+        raise ValueError("The trajectory file was made by a different version.")
+    return header
+
+
+def load_header(filename):
+    with open(filename, "rb") as file:
+        return read_header(file)
+
+
+class TrajectoryWriter:
+    """
+    Adds chunks of frames to a .traj file.
+    """
+
+    def __init__(self, filename, header, offset=None):
+        """
+        :param filename: The path to the .traj file.
+        :param header: The header to write at the start of a new file.
+        :param offset: The size of the file at the last checkpoint to carry on from,
+            or None to start a new file. Anything written after the checkpoint is removed.
+        """
+
+        self.bodies = header["bodies"]
+        if offset is None:
+            self.file = open(filename, "wb")
+            encoded = json.dumps(dict(header, version=VERSION)).encode()
+            self.file.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+        else:
+            self.file = open(filename, "r+b")
+            self.file.truncate(offset)
+            self.file.seek(offset)
+
+    def write_chunk(self, times, positions):
+        """
+        :param times: Array of the simulation time of each frame.
+        :param positions: Array of the positions in each frame, with shape (frames, bodies, 2).
+        :return: The size of the file after the chunk.
+        """
+
+        self.file.write(struct.pack("<I", len(times)))
+        self.file.write(np.asarray(times, dtype=TIME_TYPE).tobytes())
+        self.file.write(np.asarray(positions, dtype=POSITION_TYPE).tobytes())
+        self.file.flush()
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def read_chunks(filename):
+    """
+    Reads the frames of a .traj file a chunk at a time. A chunk that was only partly written is ignored.
+    :return: A generator of the times and positions in each chunk, and the fraction of the file read.
+    """
+
+    size = max(os.path.getsize(filename), 1)
+    with open(filename, "rb") as file:
+        bodies = read_header(file)["bodies"]
+        while True:
+            count_bytes = file.read(4)
+            if len(count_bytes) < 4:
+                return
+            count, = struct.unpack("<I", count_bytes)
+
+            times_size = count * TIME_TYPE.itemsize
+            positions_size = count * bodies * 2 * POSITION_TYPE.itemsize
+            data = file.read(times_size + positions_size)
+            if len(data) < times_size + positions_size:
+                return
+
+            times = np.frombuffer(data, TIME_TYPE, count)
+            positions = np.frombuffer(data, POSITION_TYPE, count * bodies * 2, times_size).reshape(count, bodies, 2)
+            yield times, positions, file.tell() / size
+
+
+def checkpoint_path(filename):
+    return f"{filename}.checkpoint.npz"
+
+
+def save_checkpoint(filename, simulation, offset, steps, description):
+    """
+    Saves the state of a simulation after a chunk has been written.
+    :param filename: The path to the .traj file.
+    :param simulation: The Simulation.
+    :param offset: The size of the .traj file after the chunk.
+    :param steps: The number of steps taken so far.
+    :param description: A dict that can be saved as JSON describing the run.
+    """
+
+    suggested_step = np.nan if simulation.suggested_step is None else simulation.suggested_step
+    temporary_path = f"{checkpoint_path(filename)}.tmp"
+    with open(temporary_path, "wb") as file:
+        np.savez(file, positions=simulation.positions, velocities=simulation.velocities, time=simulation.time,
+                 suggested_step=suggested_step, offset=offset, steps=steps,
+                 description=json.dumps(description, sort_keys=True))
+    os.replace(temporary_path, checkpoint_path(filename))
+
+
+def load_checkpoint(filename, simulation, description):
+    """
+    Puts a simulation back in the state it was saved in.
+    Raises ValueError if the checkpoint is for a different run or the .traj file has changed since it was saved.
+    :param description: The description of the run the checkpoint must have been saved by.
+    :return: The size of the .traj file at the checkpoint and the number of steps taken.
+    """
+
+    with np.load(checkpoint_path(filename)) as checkpoint:
+        if "description" not in checkpoint or str(checkpoint["description"]) != json.dumps(description, sort_keys=True):
+            raise ValueError(f"{checkpoint_path(filename)} was saved by a different run.")
+        if os.path.getsize(filename) < int(checkpoint["offset"]):
+            raise ValueError(f"{filename} is shorter than when the checkpoint was saved.")
+        simulation.positions = checkpoint["positions"].copy()
+        simulation.velocities = checkpoint["velocities"].copy()
+        simulation.time = float(checkpoint["time"])
+        suggested_step = float(checkpoint["suggested_step"])
+        simulation.suggested_step = None if np.isnan(suggested_step) else suggested_step
+        return int(checkpoint["offset"]), int(checkpoint["steps"])
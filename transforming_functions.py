@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 
 """
@@ -6,6 +7,14 @@ This is the file for the transformations you can apply to the data.
 
 To add a function write the function then add it to function_dict in the format:
    "equation": function
+
+The functions in function_dict are applied to one value at a time and can raise
+a ValueError or ZeroDivisionError if the value can't be transformed.
+
+To make a function fast on large files you can also write a version which
+transforms a whole numpy array at once and add it to array_function_dict with the same equation.
+Array functions must return nan for any value that can't be transformed.
+Functions without an array version are applied to each value in turn.
 """
 
 
@@ -40,4 +49,81 @@ function_dict = {
     "x: x^2": squared,
     "x: sin(x)": sin,
     "x: cos(x)": cos
-}
\ No newline at end of file
+}
+
+
+def array_linear(vals):
+    return vals
+
+
+def array_logarithmic(vals):
+    return np.log10(np.where(vals > 0, vals, np.nan))
+
+
+def array_reciprocal(vals):
+    return 1 / np.where(vals != 0, vals, np.nan)
+
+
+def array_squared(vals):
+    return np.square(vals)
+
+
+def array_sin(vals):
+    return np.sin(np.radians(vals))
+
+
+def array_cos(vals):
+    return np.cos(np.radians(vals))
+
+
+array_function_dict = {
+    "x: x": array_linear,
+    "x: log(x)": array_logarithmic,
+    "x: 1/x": array_reciprocal,
+    "x: x^2": array_squared,
+    "x: sin(x)": array_sin,
+    "x: cos(x)": array_cos
+}
+
+
+def vectorise(function):
+    """
+    Creates an array function from a function that transforms one value.
+    :param function: A function from function_dict.
+    :return: A function that transforms an array, giving nan where the function raises an error.
+    """
+
+    def array_function(vals):
+        result = np.empty(len(vals))
+        for i, val in enumerate(vals.tolist()):
+            try:
+                result[i] = function(val)
+            except (ValueError, ZeroDivisionError):  # If data can't be transformed
+                result[i] = np.nan
+        return result
+
+    return array_function
+
+
+def get_array_function(name):
+    """
+    :param name: The equation of the function in function_dict.
+    :return: A function that transforms a whole array.
+    """
+
+    if name in array_function_dict:
+        return array_function_dict[name]
+    return vectorise(function_dict[name])
+
+
+def apply_function(name, vals):
+    """
+    Transforms a column of data.
+    :param name: The equation of the function in function_dict.
+    :param vals: A numpy array of values.
+    :return: The transformed values and a mask of which values are valid.
+    """
+
+    with np.errstate(all="ignore"):
+        result = np.asarray(get_array_function(name)(vals), dtype=np.float64)
+    return result, ~np.isnan(result)
@@ -0,0 +1,194 @@
+import numpy as np
+
+
+"""
+This is the file for the Barnes-Hut approximation of gravity, used for simulations with lots of bodies.
+
+The bodies are put in a quadtree: the square around all the bodies is split into 4 squares,
+which are each split into 4 squares and so on.
+Each square (node) stores the total mass and centre of mass of the bodies in it.
+A node that is small compared to its distance from a body pulls on the body as one mass at its centre of mass,
+otherwise the 4 smaller nodes inside it are used instead. Nodes are small enough when
+   width / distance < theta
+so a smaller opening angle theta is more accurate and slower, and theta = 0 is the same as adding every pair.
+
+The tree is built from the Morton code of each body, which interleaves the bits of its x and y cell,
+so sorting the bodies by code puts the bodies in each node next to each other.
+The tree is searched for a batch of bodies at once using numpy arrays of (body, node) pairs.
+"""
+
+
+LEVELS = 21
+BATCH_SIZE = 4096
+
+
+def spread_bits(values):
+    """
+    :return: The values with a 0 bit put before each bit, eg. 0b111 becomes 0b10101.
+    """
+
+    values = values.astype(np.uint64)
+    values = (values | (values << 16)) & 0x0000FFFF0000FFFF
+    values = (values | (values << 8)) & 0x00FF00FF00FF00FF
+    values = (values | (values << 4)) & 0x0F0F0F0F0F0F0F0F
+    values = (values | (values << 2)) & 0x3333333333333333
+    values = (values | (values << 1)) & 0x5555555555555555
+    return values
+
+
+def expand_ranges(starts, counts):
+    """
+    :return: The indices from each start to start + count, all joined together.
+    """
+
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+def morton_codes(positions):
+    """
+    :param positions: Array of the (x, y) position of each body.
+    :return: The Morton code of each body in the square around all the bodies and the width of the square.
+    """
+
+    if not len(positions):
+        return np.empty(0, dtype=np.uint64), 1.0
+    low = positions.min(axis=0)
+    width = (positions.max(axis=0) - low).max()
+    if width <= 0:
+        width = 1.0
+    cells = np.minimum((positions - low) * (2 ** LEVELS / width), 2 ** LEVELS - 1).astype(np.uint64)
+    return spread_bits(cells[:, 0]) | (spread_bits(cells[:, 1]) << 1), width
+
+
+class TreeLevel:
+    """
+    The nodes of the quadtree that are all the same size.
+    Each node holds the bodies from start to start + count in the sorted bodies.
+    """
+
+    def __init__(self, starts, body_count, masses, moments, last):
+        self.start = starts
+        self.count = np.diff(np.append(starts, body_count))
+        self.mass = np.add.reduceat(masses, starts)
+        # nodes with no mass are put at the first body so they don't divide by 0
+        moment = np.add.reduceat(moments, starts, axis=0)
+        mass = np.where(self.mass > 0, self.mass, 1)[:, np.newaxis]
+        self.centre = moment / mass
+        self.leaf = (self.count == 1) | last
+
+        self.child_start = None
+        self.child_stop = None
+
+    def link_children(self, children):
+        """
+        Finds the range of nodes in the next level that are inside each node.
+        """
+
+        self.child_start = np.searchsorted(children.start, self.start)
+        self.child_stop = np.searchsorted(children.start, self.start + self.count)
+
+
+class QuadTree:
+    """
+    A quadtree of bodies with the mass and centre of mass of each node.
+    """
+
+    def __init__(self, positions, masses):
+        codes, self.width = morton_codes(positions)
+        self.order = np.argsort(codes, kind="stable")
+        codes = codes[self.order]
+        self.positions = positions[self.order]
+        self.masses = masses[self.order]
+        moments = self.masses[:, np.newaxis] * self.positions
+
+        self.levels = []
+        # there are no nodes if there are no bodies
+        for level in range(LEVELS + 1 if len(codes) else 0):
+            prefixes = codes >> np.uint64(2 * (LEVELS - level))
+            starts = np.flatnonzero(np.diff(prefixes, prepend=prefixes[:1] + np.uint64(1)))
+            # stop splitting once every body has its own node
+            last = level == LEVELS or len(starts) == len(codes)
+            self.levels.append(TreeLevel(starts, len(codes), self.masses, moments, last))
+            if last:
+                break
+
+        for level, children in zip(self.levels, self.levels[1:]):
+            level.link_children(children)
+
+    def batch_accelerations(self, bodies, theta, softening):
+        """
+        :param bodies: Sorted indices of the bodies in the batch, next to each other.
+        :return: The acceleration of each body in the batch divided by G.
+        """
+
+        first = bodies[0]
+        x_total = np.zeros(len(bodies))
+        y_total = np.zeros(len(bodies))
+
+        # every body starts at the root node
+        pair_bodies = bodies
+        pair_nodes = np.zeros(len(bodies), dtype=np.intp)
+
+        for depth, level in enumerate(self.levels):
+            if not len(pair_bodies):
+                break
+
+            dx = level.centre[pair_nodes, 0] - self.positions[pair_bodies, 0]
+            dy = level.centre[pair_nodes, 1] - self.positions[pair_bodies, 1]
+            distance_squared = dx * dx + dy * dy
+
+            # nodes containing the body are always opened, leaves containing it are the body itself
+            starts = level.start[pair_nodes]
+            contains = (pair_bodies >= starts) & (pair_bodies < starts + level.count[pair_nodes])
+            leaf = level.leaf[pair_nodes]
+            size = self.width / 2 ** depth
+            accept = ~contains & (leaf | (size * size < theta * theta * distance_squared))
+
+            distance_squared = distance_squared[accept] + softening ** 2
+            strength = level.mass[pair_nodes[accept]] / (distance_squared * np.sqrt(distance_squared))
+            accepted_bodies = pair_bodies[accept] - first
+            x_total += np.bincount(accepted_bodies, strength * dx[accept], len(bodies))
+            y_total += np.bincount(accepted_bodies, strength * dy[accept], len(bodies))
+
+            # a leaf with more than one body can't be opened, so the other bodies in it pull on the body directly
+            shared = contains & leaf & (level.count[pair_nodes] > 1)
+            if shared.any():
+                counts = level.count[pair_nodes[shared]]
+                targets = np.repeat(pair_bodies[shared], counts)
+                others = expand_ranges(starts[shared], counts)
+                targets, others = targets[others != targets], others[others != targets]
+
+                dx = self.positions[others, 0] - self.positions[targets, 0]
+                dy = self.positions[others, 1] - self.positions[targets, 1]
+                distance_squared = dx * dx + dy * dy + softening ** 2
+                strength = self.masses[others] / (distance_squared * np.sqrt(distance_squared))
+                x_total += np.bincount(targets - first, strength * dx, len(bodies))
+                y_total += np.bincount(targets - first, strength * dy, len(bodies))
+
+            if level.child_start is None:
+                break
+
+            # replace the nodes that are too close with the nodes inside them
+            opened = ~accept & ~leaf
+            opened_nodes = pair_nodes[opened]
+            child_start = level.child_start[opened_nodes]
+            child_count = level.child_stop[opened_nodes] - child_start
+            pair_bodies = np.repeat(pair_bodies[opened], child_count)
+            pair_nodes = expand_ranges(child_start, child_count)
+
+        return np.column_stack((x_total, y_total))
+
+    def accelerations(self, theta, softening=0.0):
+        """
+        :return: The acceleration of each body divided by G, in the order the bodies were given.
+        """
+
+        result = np.empty_like(self.positions)
+        for start in range(0, len(self.positions), BATCH_SIZE):
+            bodies = np.arange(start, min(start + BATCH_SIZE, len(self.positions)))
+            result[bodies] = self.batch_accelerations(bodies, theta, softening)
+
+        unsorted = np.empty_like(result)
+        unsorted[self.order] = result
+        return unsorted